@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,9 +90,121 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a connection is kept for the next requests of its thread
+        # (production: 60). runserver serves every request on a new thread,
+        # so it opens a connection per request whatever the value.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        # Set DB_PGBOUNCER=1 when DB_HOST is a PgBouncer in transaction
+        # pooling mode, which hands each transaction to any server
+        # connection, so a cursor cannot outlive its transaction.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
     }
 }
 
+# Read replicas of the primary, one per host of the comma separated
+# DB_REPLICA_HOSTS, with its database name and the credentials of
+# DB_REPLICA_USER and DB_REPLICA_PASS, or those of the primary. The reads
+# of GET requests go to them (see core.routers); tests read from the
+# primary test database.
+DB_REPLICAS = []
+for index, host in enumerate(filter(None, map(
+        str.strip, os.environ.get('DB_REPLICA_HOSTS', '').split(','))), 1):
+    DATABASES[f'replica{index}'] = dict(
+        DATABASES['default'],
+        HOST=host,
+        USER=os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        PASSWORD=os.environ.get(
+            'DB_REPLICA_PASS', DATABASES['default']['PASSWORD']),
+        TEST={'MIRROR': 'default'},
+    )
+    DB_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds the reads of a client go to the primary after it wrote, so it
+# sees its changes despite replication lag, and the cache alias keeping
+# the pins. The alias must be shared by the workers, or a client is only
+# pinned in the worker that served its write; settings_production refuses
+# a LocMemCache default with more than one worker.
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+DB_REPLICA_PIN_CACHE = 'default'
+
+
+# Close persistent connections that stopped answering at the start of
+# each request (see core.db); enabled by the production settings
+DB_HEALTH_CHECKS = False
+
+
+# Request metrics: query count, database, serialization, rendering and
+# total time per view name, served in the Prometheus format at /metrics
+# (keep it internal at the front proxy). Histogram bucket bounds are in seconds and queries.
+# METRICS_SLOW_REQUESTS is the number of slowest requests per process
+# whose SQL is logged; 0 turns sampling off.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '') == '1'
+METRICS_PREFIX = 'app'
+METRICS_BUCKETS = {
+    'seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'queries': (0, 1, 2, 3, 5, 10, 20, 50, 100),
+}
+METRICS_SLOW_REQUESTS = int(os.environ.get('METRICS_SLOW_REQUESTS', 0))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Cache alias and timeout (seconds) for per-user recipe API responses.
+# LocMemCache is per process; use a shared backend with several workers.
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = 300
+
+# Text search configuration of the recipe search vector
+RECIPE_SEARCH_CONFIG = 'english'
+
+# Largest list payload accepted by the recipe API bulk endpoints
+RECIPE_BULK_MAX_ITEMS = 1000
+
+# Rows per server-side cursor fetch of the streamed recipe export
+RECIPE_EXPORT_CHUNK_SIZE = 500
+
+# Default and largest number of names returned by the tag and ingredient
+# autocomplete, and the total number of names of the (user, resource)
+# lists kept sorted in memory per process to answer it, roughly 200 bytes
+# each (0 queries the database instead)
+RECIPE_AUTOCOMPLETE_LIMIT = 10
+RECIPE_AUTOCOMPLETE_MAX_LIMIT = 50
+RECIPE_AUTOCOMPLETE_CACHE_NAMES = int(
+    os.environ.get('RECIPE_AUTOCOMPLETE_CACHE_NAMES', 100000))
+
+# Threads, and so database connections, per process running the queries
+# of the async recipe API (api/async/recipe/)
+RECIPE_ASYNC_DB_THREADS = int(os.environ.get('RECIPE_ASYNC_DB_THREADS', 8))
+
+# Recipe images: accepted extensions and size (bytes) of uploads, bounding
+# box edges (pixels) and quality of the WebP/JPEG thumbnails, and worker
+# processes making them (0 makes them inline, on the request thread)
+RECIPE_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp', 'gif']
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_THUMBNAIL_SIZES = (160, 480, 960)
+RECIPE_THUMBNAIL_QUALITY = 85
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+
+# Token authentication cache: size and time to live (seconds) of the per
+# process cache of resolved API tokens. Changes made through another
+# process are seen by this one after at most the TTL.
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -110,6 +225,57 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+AUTHENTICATION_BACKENDS = [
+    'user.backends.PooledModelBackend',
+]
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# New passwords use PASSWORD_HASHER; the others still verify older hashes,
+# which are upgraded on the next successful login.
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+
+_PASSWORD_HASHERS = {
+    'argon2': 'core.hashers.TunableArgon2PasswordHasher',
+    'pbkdf2': 'core.hashers.TunablePBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+]
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 260000))
+
+# Threads that hash passwords, and logins allowed to wait for one
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 16))
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # orjson based when it is installed, with the output of DRF's classes
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '60/min',
+        'login_email': '10/min',
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -132,6 +298,19 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT= '/vol/web/static'
+
+# Media files are served to their owner by recipe.media, which hands them
+# off to the front proxy when MEDIA_SENDFILE is 'x-accel-redirect' (nginx,
+# with an internal location for MEDIA_ACCEL_REDIRECT_PREFIX aliased to
+# MEDIA_ROOT) or 'x-sendfile' (Apache, lighttpd), and caches them privately
+# for MEDIA_CACHE_MAX_AGE seconds as their names are never reused
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Uploads are streamed to temporary files here before being moved into
+# MEDIA_ROOT; on the same filesystem the move is a rename
+FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR')
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
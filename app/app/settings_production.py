@@ -0,0 +1,91 @@
+"""
+Production settings for app project.
+
+Serve with gunicorn (see gunicorn.conf.py) and
+DJANGO_SETTINGS_MODULE=app.settings_production. SECRET_KEY and
+ALLOWED_HOSTS must be set in the environment.
+
+https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
+"""
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES, MIDDLEWARE
+from django.core.exceptions import ImproperlyConfigured
+import multiprocessing
+import os
+
+DEBUG = False
+
+SECRET_KEY = os.environ['SECRET_KEY']
+
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '').split(',')
+
+
+# Database
+# Keep connections open between requests and replace dead ones first
+
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+DB_HEALTH_CHECKS = True
+
+
+# Cache
+# Response versions and change markers, login throttles and replica pins
+# are only right when every worker sees the same cache, so a per-process
+# LocMemCache is refused unless a single worker serves the app.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
+
+# as in gunicorn.conf.py
+GUNICORN_WORKERS = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+if CACHES['default']['BACKEND'].endswith('.LocMemCache') and \
+        GUNICORN_WORKERS > 1:
+    raise ImproperlyConfigured(
+        'LocMemCache is per process; set CACHE_BACKEND to a cache shared '
+        'by the GUNICORN_WORKERS workers, such as Memcached')
+
+
+# Static files are compressed, fingerprinted and served from memory by
+# WhiteNoise; media files are handed off to the front proxy by
+# recipe.media when MEDIA_SENDFILE is set.
+
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+)
+
+STATICFILES_STORAGE = \
+    'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+
+# Security
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.environ.get('LOG_LEVEL', 'INFO'),
+    },
+}
@@ -13,13 +13,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 
+from app.views import health, metrics
+from recipe.views import RecipeImageView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/async/recipe/', include('recipe.async_urls')),
+    path('metrics', metrics, name='metrics'),
+    path('health', health, name='health'),
+    re_path(r'^{}(?P<name>uploads/recipe/[\w.-]+)$'.format(
+        settings.MEDIA_URL.lstrip('/')),
+        RecipeImageView.as_view(), name='media'),
+]
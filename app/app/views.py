@@ -0,0 +1,49 @@
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import Http404, HttpResponse, JsonResponse
+
+from core import db
+from core import metrics as request_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def metrics(request):
+    """Expose the request histograms of this process to Prometheus"""
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    return HttpResponse(request_metrics.render_prometheus(),
+                        content_type='text/plain; version=0.0.4')
+
+
+def health(request):
+    """Report whether the primary database answers, for readiness probes
+
+    Answers 503 when the primary is unavailable. A replica that is down
+    does not make the process unready, as the primary can serve its
+    reads. With METRICS_ENABLED, the status, latency and connections of
+    every database are reported too.
+    """
+    aliases = list(connections) if settings.METRICS_ENABLED \
+        else [DEFAULT_DB_ALIAS]
+    databases = {}
+    for alias in aliases:
+        try:
+            latency = db.check(alias)
+        except DatabaseError:
+            logger.exception('Database %s unavailable', alias)
+            databases[alias] = {'status': 'unavailable'}
+        else:
+            databases[alias] = {'status': 'ok',
+                                'latency_ms': round(latency * 1000, 2)}
+    healthy = databases[DEFAULT_DB_ALIAS]['status'] == 'ok'
+    data = {'status': 'ok' if healthy else 'unavailable'}
+    if settings.METRICS_ENABLED:
+        for alias, stats in db.pool_stats().items():
+            databases[alias].update(
+                stats,
+                max_age=connections[alias].settings_dict['CONN_MAX_AGE'])
+        data['databases'] = databases
+    return JsonResponse(data, status=200 if healthy else 503)
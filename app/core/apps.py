@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.db import track_connection
+        connection_created.connect(track_connection)
+        if settings.DB_HEALTH_CHECKS:
+            from core.db import close_unusable_connections
+            request_started.connect(close_unusable_connections)
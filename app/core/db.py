@@ -0,0 +1,69 @@
+"""Health of the database connections of the process
+
+Django keeps one connection per thread and database, reused between
+requests for CONN_MAX_AGE seconds, so a worker process holds at most one
+connection per thread: this is the connection pool of the process. The
+connections it opened are tracked here for the health view.
+"""
+import threading
+import time
+import weakref
+from collections import Counter
+
+from django.db import connections
+
+_lock = threading.Lock()
+# every connection wrapper of the process that opened a connection
+_wrappers = weakref.WeakSet()
+_opened = Counter()
+
+
+def close_unusable_connections(**kwargs):
+    """Close persistent connections that stopped answering
+
+    Runs on request_started when DB_HEALTH_CHECKS is set, so a connection
+    dropped by the server or a restart is replaced before the request
+    uses it instead of failing the request.
+    """
+    for conn in connections.all():
+        if conn.connection is not None and not conn.in_atomic_block \
+                and not conn.is_usable():
+            conn.close()
+
+
+def track_connection(sender, connection, **kwargs):
+    """Count a connection opened by the process, on connection_created"""
+    with _lock:
+        _wrappers.add(connection)
+        _opened[connection.alias] += 1
+
+
+def pool_stats():
+    """Return the connections of the process by database alias
+
+    open is the number of connections held by its threads and opened the
+    number of connections opened since the process started, far fewer
+    than the requests served when connections are reused.
+    """
+    stats = {alias: {'open': 0, 'opened': 0}
+             for alias in connections}
+    with _lock:
+        wrappers = list(_wrappers)
+        opened = dict(_opened)
+    for wrapper in wrappers:
+        if wrapper.connection is not None:
+            stats[wrapper.alias]['open'] += 1
+    for alias, count in opened.items():
+        stats[alias]['opened'] = count
+    return stats
+
+
+def check(alias):
+    """Return the seconds a database took to answer SELECT 1
+
+    Raises the DatabaseError of a database that does not answer.
+    """
+    started = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return time.perf_counter() - started
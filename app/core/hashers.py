@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, \
+    PBKDF2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id hasher whose cost is read from settings
+
+    Passwords hashed with other parameters are rehashed on the next
+    successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 hasher whose iteration count is read from settings"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
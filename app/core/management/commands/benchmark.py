@@ -0,0 +1,286 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.models import Tag, Ingredient, Recipe
+from core.utils import bulk_create, percentile
+from recipe import cache, search, summaries
+from user.authentication import token_cache
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'salmon', 'tofu', 'rice', 'noodle', 'curry',
+    'soup', 'salad', 'cake', 'bread', 'pie', 'stew', 'roast', 'grilled',
+    'spicy', 'sweet', 'sour', 'garlic', 'ginger', 'lemon', 'tomato',
+    'mushroom', 'cheese', 'chocolate', 'vanilla', 'honey', 'miso', 'sesame',
+]
+PASSWORD = 'bench-password'
+BATCH_SIZE = 500
+# tags and ingredients of each fixture recipe
+TAGS_PER_RECIPE = 3
+INGREDIENTS_PER_RECIPE = 6
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe and user API endpoints"""
+    help = ('Load fixtures of users with the given numbers of recipes, '
+            'request the recipe, tag, ingredient, token and user endpoints '
+            'through the test client and report latency percentiles, '
+            'queries and allocations per endpoint. Results can be saved as '
+            'a JSON baseline and compared with one to flag regressions. '
+            'The fixtures are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, nargs='+', default=[10, 1000, 10000],
+            help='Recipes of each fixture user (e.g. 10 1000 100000)')
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--output',
+                            help='Write the results to this JSON file')
+        parser.add_argument('--compare',
+                            help='JSON baseline to compare the results with')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Relative increase of p50 latency or allocations flagged '
+                 'as a regression (default 0.2); any added query is one')
+        parser.add_argument(
+            '--min-ms', type=float, default=1.0,
+            help='Latency increases below this many ms are not flagged')
+
+    def handle(self, *args, **options):
+        results = {}
+        # the test client sends requests to host 'testserver'
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=allowed_hosts), \
+                transaction.atomic():
+            for size in options['recipes']:
+                user = self.load_fixture(size, options)
+                results.update(self.run_endpoints(user, size, options))
+                self.forget(user)
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            regressions = self.compare(results, baseline['results'], options)
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} regressions: '
+                    f'{", ".join(regressions)}')
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def load_fixture(self, size, options):
+        self.stdout.write(f'Loading a user with {size} recipes...')
+        started = time.perf_counter()
+        rng = random.Random(size)
+        user = get_user_model().objects.create_user(
+            first_name='bench', last_name='bench',
+            username=f'bench-{size}', phone_number='0',
+            email=f'bench-{size}@example.com', password=PASSWORD)
+        tags = bulk_create(Tag, [
+            Tag(user=user, name=f'tag {index}')
+            for index in range(options['tags'])])
+        ingredients = bulk_create(Ingredient, [
+            Ingredient(user=user, name=f'{rng.choice(WORDS)} {index}')
+            for index in range(options['ingredients'])])
+        Recipe.objects.bulk_create((
+            Recipe(user=user,
+                   title=' '.join(rng.sample(WORDS, 3)),
+                   price=rng.randrange(100, 5000) / 100,
+                   time_minutes=rng.randrange(5, 180))
+            for index in range(size)), batch_size=BATCH_SIZE)
+
+        pks = iter(Recipe.objects.filter(user=user).order_by(
+            'pk').values_list('pk', flat=True).iterator())
+        while True:
+            batch = list(islice(pks, BATCH_SIZE))
+            if not batch:
+                break
+            for field, objs, count in (
+                    ('tags', tags, TAGS_PER_RECIPE),
+                    ('ingredients', ingredients, INGREDIENTS_PER_RECIPE)):
+                recipe_field = Recipe._meta.get_field(field)
+                through = recipe_field.remote_field.through
+                target = recipe_field.m2m_reverse_name()
+                through.objects.bulk_create([
+                    through(recipe_id=pk, **{target: obj.pk})
+                    for pk in batch
+                    for obj in rng.sample(objs, min(count, len(objs)))
+                ])
+            recipes = Recipe.objects.filter(pk__in=batch)
+            search.update_search_vector(recipes)
+            summaries.refresh(recipes)
+
+        self.stdout.write(f'Loaded in {time.perf_counter() - started:.1f} s')
+        return user
+
+    def get_endpoints(self, user):
+        """Return (name, method, url, data) of each benchmarked request
+
+        data may be a function of the iteration, for creates that need
+        a new name each time.
+        """
+        recipe = Recipe.objects.filter(user=user).order_by('pk').first()
+        tag = Tag.objects.filter(user=user).order_by('pk').first()
+        ingredient = Ingredient.objects.filter(
+            user=user).order_by('pk').first()
+        recipe_url = reverse('recipe:recipe-list')
+        detail_url = reverse('recipe:recipe-detail', args=[recipe.pk])
+        return [
+            ('recipe-list', 'get', recipe_url, None),
+            ('recipe-list-filtered', 'get',
+             f'{recipe_url}?tags={tag.pk}', None),
+            ('recipe-list-100', 'get',
+             f'{recipe_url}?page_size=100', None),
+            ('recipe-export', 'get', reverse('recipe:recipe-export'), None),
+            ('recipe-detail', 'get', detail_url, None),
+            ('recipe-create', 'post', recipe_url, lambda index: {
+                'title': f'bench {index}', 'time_minutes': 10,
+                'price': '5.00', 'tags': [tag.pk],
+                'ingredients': [ingredient.pk]}),
+            ('recipe-update', 'patch', detail_url, lambda index: {
+                'title': f'bench {index}'}),
+            ('tag-list', 'get', reverse('recipe:tag-list'), None),
+            ('tag-create', 'post', reverse('recipe:tag-list'),
+             lambda index: {'name': f'bench tag {index}'}),
+            ('ingredient-list', 'get',
+             reverse('recipe:ingredient-list'), None),
+            ('ingredient-autocomplete', 'get',
+             f"{reverse('recipe:ingredient-autocomplete')}?q=sa", None),
+            ('token', 'post', reverse('user:token'), lambda index: {
+                'email': user.email, 'password': PASSWORD}),
+            ('me', 'get', reverse('user:me'), None),
+        ]
+
+    def run_endpoints(self, user, size, options):
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        results = {}
+        for name, method, url, data in self.get_endpoints(user):
+            def request(index):
+                if name == 'token':
+                    self.reset_throttles(user)
+                if data is None:
+                    response = getattr(client, method)(url)
+                else:
+                    response = getattr(client, method)(
+                        url, data(index), format='json')
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{method.upper()} {url} returned '
+                        f'{response.status_code}: {response.content[:200]}')
+                # consume streamed responses so they are timed whole
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            request(-1)
+            timings, queries = [], []
+            for index in range(options['iterations']):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    request(index)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+
+            # tracing slows every allocation, so it gets its own request
+            tracemalloc.start()
+            try:
+                request(options['iterations'])
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            results[f'{size}:{name}'] = {
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'queries': max(queries),
+                'alloc_peak_kb': round(peak / 1024, 1),
+            }
+        return results
+
+    def reset_throttles(self, user):
+        """Forget login attempts, which the token endpoint limits"""
+        SimpleRateThrottle.cache.delete_many([
+            SimpleRateThrottle.cache_format % {'scope': scope, 'ident': ident}
+            for scope, ident in (('login_ip', '127.0.0.1'),
+                                 ('login_email', user.email))
+        ])
+
+    def forget(self, user):
+        # the rows are rolled back, but not the per-process caches
+        token_cache.clear()
+        for resource in ('recipe', 'tag', 'ingredient'):
+            cache.invalidate(user.pk, resource)
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"endpoint":<32}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+            f'{"queries":>9}{"alloc KB":>10}')
+        for key, result in results.items():
+            self.stdout.write(
+                f'{key:<32}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+                f'{result["queries"]:>9}{result["alloc_peak_kb"]:>10.1f}')
+
+    def compare(self, results, baseline, options):
+        """Report changes from a baseline and return the regressed keys"""
+        regressions = []
+        for key, result in results.items():
+            base = baseline.get(key)
+            if base is None:
+                continue
+            problems = []
+            if result['p50_ms'] - base['p50_ms'] >= options['min_ms'] and \
+                    result['p50_ms'] > base['p50_ms'] * (
+                        1 + options['threshold']):
+                problems.append(
+                    f'p50 {base["p50_ms"]:.2f} -> {result["p50_ms"]:.2f} ms')
+            if result['queries'] > base['queries']:
+                problems.append(
+                    f'queries {base["queries"]} -> {result["queries"]}')
+            if result['alloc_peak_kb'] > base['alloc_peak_kb'] * (
+                    1 + options['threshold']):
+                problems.append(
+                    f'allocations {base["alloc_peak_kb"]:.1f} -> '
+                    f'{result["alloc_peak_kb"]:.1f} KB')
+            if problems:
+                regressions.append(key)
+                self.stdout.write(self.style.ERROR(
+                    f'{key}: {", ".join(problems)}'))
+        return regressions
@@ -0,0 +1,258 @@
+import csv
+import io
+import json
+import os
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from core.utils import bulk_create
+from recipe import cache, search, summaries
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+FORMATS = ('ndjson', 'csv', 'json')
+FIELDS = ('title', 'price', 'link', 'time_minutes')
+RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+
+
+def read_records(path, file_format):
+    """Yield the records of a file one at a time
+
+    NDJSON has an object per line and CSV a header line, with tags and
+    ingredients as '|' separated names, as the recipe export writes them.
+    A JSON array is parsed incrementally with ijson. An NDJSON line that
+    is not JSON is yielded as a ValidationError, so it is counted as an
+    invalid record.
+    """
+    if file_format == 'ndjson':
+        with open(path, encoding='utf-8') as lines:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield ValidationError(f'Invalid JSON: {exc}')
+    elif file_format == 'csv':
+        with open(path, encoding='utf-8', newline='') as lines:
+            yield from csv.DictReader(lines)
+    else:
+        with open(path, 'rb') as stream:
+            try:
+                yield from ijson.items(stream, 'item', use_float=False)
+            except ijson.JSONError as exc:
+                # the array cannot be read past a syntax error
+                raise CommandError(f'Invalid JSON array: {exc}')
+
+
+def related_names(model, value):
+    """Return the tag or ingredient names of a record value
+
+    Raise ValidationError for a value that is not a '|' separated string
+    or a list of names or of objects with a name, or for a name the name
+    field of model does not accept.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('|')
+    if not isinstance(value, list):
+        raise ValidationError('Expected a list of names')
+    names = [item.get('name') if isinstance(item, dict) else item
+             for item in value]
+    if not all(isinstance(name, str) for name in names):
+        raise ValidationError('Expected a list of names')
+    field = model._meta.get_field('name')
+    return [field.clean(name.strip(), None)
+            for name in names if name.strip()]
+
+
+class Command(BaseCommand):
+    """Django command to import recipes from a large file"""
+    help = ('Import recipes for a user from an NDJSON, CSV or JSON file, '
+            'such as a recipe export, in batches. Tags and ingredients are '
+            'matched by name in any case and created when missing. An '
+            'interrupted import is resumed from its checkpoint file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the recipes')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format (default: from the extension)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file (default: the path plus .checkpoint)')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore an existing checkpoint and import from the start')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or \
+            os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Unknown format {file_format!r}, use --format')
+        if file_format == 'json' and ijson is None:
+            raise CommandError(
+                'Reading JSON arrays needs the ijson package; '
+                'convert the file to NDJSON or install ijson')
+        try:
+            self.user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}')
+
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = 0 if options['restart'] else self.read_checkpoint(path)
+        if skip:
+            self.stdout.write(f'Resuming after {skip} records')
+
+        # lower-cased name -> id of the user's tags and ingredients,
+        # filled as the records are read so each name is created once
+        self.ids = {field: {} for field in RELATIONS}
+        self.created = {field: 0 for field in RELATIONS}
+        self.imported = self.invalid = 0
+
+        records = enumerate(read_records(path, file_format), 1)
+        # skip the records imported before the interruption
+        next(islice(records, skip, skip), None)
+        done = skip
+        started = time.monotonic()
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            self.import_batch(batch)
+            done = batch[-1][0]
+            self.write_checkpoint(path, done)
+            rate = (done - skip) / (time.monotonic() - started)
+            self.stdout.write(f'{done} records, {rate:.0f} records/s')
+
+        elapsed = time.monotonic() - started
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        cache.invalidate(self.user.pk, 'recipe')
+        for field, model in RELATIONS.items():
+            cache.invalidate(self.user.pk, model._meta.model_name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} recipes in {elapsed:.1f}s '
+            f'({self.imported / elapsed if elapsed else 0:.0f} recipes/s), '
+            f'created {self.created["tags"]} tags and '
+            f'{self.created["ingredients"]} ingredients, '
+            f'skipped {self.invalid} invalid records'))
+
+    def clean(self, index, record):
+        """Return the field values and relation names of a record
+
+        Return None for an invalid record.
+        """
+        try:
+            if isinstance(record, ValidationError):
+                raise record
+            if not isinstance(record, dict):
+                raise ValidationError('Expected an object')
+            values = {}
+            for name in FIELDS:
+                field = Recipe._meta.get_field(name)
+                value = record.get(name)
+                if value in (None, '') and field.blank:
+                    value = ''
+                if isinstance(value, float):
+                    value = Decimal(str(value))
+                values[name] = field.clean(value, None)
+            relations = {field: related_names(model, record.get(field))
+                         for field, model in RELATIONS.items()}
+            return values, relations
+        except ValidationError as exc:
+            self.invalid += 1
+            self.stderr.write(f'Record {index} skipped: {exc.messages}')
+            return None
+
+    def import_batch(self, batch):
+        recipes, relations = [], []
+        for index, record in batch:
+            cleaned = self.clean(index, record)
+            if cleaned is None:
+                continue
+            values, names = cleaned
+            recipes.append(Recipe(user=self.user, **values))
+            relations.append(names)
+
+        with transaction.atomic():
+            for field, model in RELATIONS.items():
+                self.create_missing(field, model, relations)
+            bulk_create(Recipe, recipes)
+            for field in RELATIONS:
+                self.write_through_rows(field, recipes, relations)
+            imported = Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes])
+            # what the signals do for recipes saved one at a time
+            search.update_search_vector(imported)
+            summaries.refresh(imported)
+        self.imported += len(recipes)
+
+    def create_missing(self, field, model, relations):
+        ids = self.ids[field]
+        names = {name.lower(): name for items in relations
+                 for name in items[field] if name.lower() not in ids}
+        objs, created = model.objects.get_or_create_names(
+            self.user, list(names.values()))
+        ids.update((name, obj.pk) for name, obj in objs.items())
+        self.created[field] += len(created)
+
+    def write_through_rows(self, field, recipes, relations):
+        recipe_field = Recipe._meta.get_field(field)
+        through = recipe_field.remote_field.through
+        source = recipe_field.m2m_column_name()
+        target = recipe_field.m2m_reverse_name()
+        rows = [(recipe.pk, pk)
+                for recipe, items in zip(recipes, relations)
+                for pk in dict.fromkeys(self.ids[field][name.lower()]
+                                        for name in items[field])]
+        connection = connections[router.db_for_write(through)]
+        if connection.vendor == 'postgresql':
+            # COPY skips the per-row INSERT overhead
+            data = io.StringIO(''.join(f'{recipe_id}\t{pk}\n'
+                                       for recipe_id, pk in rows))
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {through._meta.db_table} ({source}, {target}) '
+                    f'FROM STDIN', data)
+        else:
+            through.objects.bulk_create([
+                through(**{source: recipe_id, target: pk})
+                for recipe_id, pk in rows
+            ])
+
+    def read_checkpoint(self, path):
+        """Return the number of records already imported from path"""
+        try:
+            with open(self.checkpoint) as file:
+                checkpoint = json.load(file)
+        except FileNotFoundError:
+            return 0
+        if checkpoint.get('size') != os.path.getsize(path):
+            raise CommandError(
+                f'{self.checkpoint} is for another version of the file; '
+                f'use --restart to import from the start')
+        return checkpoint['records']
+
+    def write_checkpoint(self, path, records):
+        # replaced atomically, so an interruption leaves a valid file
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'size': os.path.getsize(path), 'records': records},
+                      file)
+        os.replace(temporary, self.checkpoint)
@@ -0,0 +1,142 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils import percentile
+
+RECIPE_ENDPOINTS = [
+    '/api/recipe/recipes/',
+    '/api/recipe/tags/',
+    '/api/recipe/ingredients/',
+]
+
+ENDPOINTS = RECIPE_ENDPOINTS + ['/api/user/me/']
+
+ASYNC_ENDPOINTS = [path.replace('/api/', '/api/async/', 1)
+                   for path in RECIPE_ENDPOINTS]
+
+
+class Command(BaseCommand):
+    """Django command to load test the API of a running server"""
+    help = ('Send authenticated GET requests to a running server from '
+            'concurrent keep-alive connections and report req/s and '
+            'latency percentiles per endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url', help='Base URL of the server, e.g. http://localhost:8000')
+        parser.add_argument('--email', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=30.0,
+                            help='Seconds to send requests for')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Path to request; repeat for several (default: the '
+                 'recipe, tag, ingredient and user endpoints)')
+        parser.add_argument(
+            '--async-url',
+            help='Base URL of an ASGI server to load test afterwards on the '
+                 'async recipe endpoints, to compare with the recipe '
+                 'endpoints of the first')
+
+    def handle(self, *args, **options):
+        if options['async_url']:
+            runs = [(options['url'], RECIPE_ENDPOINTS),
+                    (options['async_url'], ASYNC_ENDPOINTS)]
+        else:
+            runs = [(options['url'], options['endpoints'] or ENDPOINTS)]
+
+        throughput = []
+        for url, endpoints in runs:
+            self.stdout.write(f'{url} ({options["concurrency"]} clients)')
+            results, errors, elapsed = self.load(
+                urlsplit(url), endpoints, options)
+            self.report(results, errors, elapsed)
+            throughput.append(
+                sum(len(times) for times in results.values()) / elapsed)
+        if len(throughput) == 2:
+            self.stdout.write(
+                f'async/sync throughput: {throughput[1] / throughput[0]:.2f}')
+
+    def load(self, url, endpoints, options):
+        """Return the latencies and errors per endpoint and the duration"""
+        token = self.get_token(url, options['email'], options['password'])
+        results = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def worker(offset):
+            conn = self.connect(url)
+            headers = {'Authorization': f'Token {token}'}
+            index = offset
+            while time.monotonic() < deadline:
+                path = endpoints[index % len(endpoints)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = self.connect(url)
+                    ok = False
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    results[path].append(elapsed)
+                    if not ok:
+                        errors[path] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=worker, args=(offset,))
+                   for offset in range(options['concurrency'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors, time.monotonic() - started
+
+    def connect(self, url):
+        if url.scheme == 'https':
+            return http.client.HTTPSConnection(url.netloc, timeout=30)
+        return http.client.HTTPConnection(url.netloc, timeout=30)
+
+    def get_token(self, url, email, password):
+        conn = self.connect(url)
+        conn.request(
+            'POST', '/api/user/token/',
+            body=json.dumps({'email': email, 'password': password}),
+            headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        if response.status != 200:
+            raise CommandError(
+                f'Could not get a token ({response.status}): {body!r}')
+        return json.loads(body)['token']
+
+    def report(self, results, errors, elapsed):
+        rows = sorted(results.items())
+        rows.append(('total', [t for _, times in rows for t in times]))
+        errors['total'] = sum(errors.values())
+        self.stdout.write(
+            f'{"endpoint":<32}{"requests":>10}{"req/s":>10}'
+            f'{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}')
+        for path, times in rows:
+            if not times:
+                continue
+            p99 = percentile(times, 99)
+            self.stdout.write(
+                f'{path:<32}{len(times):>10}{len(times) / elapsed:>10.1f}'
+                f'{statistics.median(times):>10.2f}{p99:>10.2f}'
+                f'{errors[path]:>8}')
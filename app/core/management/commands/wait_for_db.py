@@ -2,20 +2,49 @@ import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until database is availble"""
+    """Django command to pause execution until database is availble
+
+    The database is ready once it answers a query. Attempts are retried
+    with a delay doubling from --delay up to --max-delay, until --timeout
+    seconds have passed.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default',
+                            help='Alias of the database to wait for')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before failing')
+        parser.add_argument('--delay', type=float, default=0.1,
+                            help='Seconds before the first retry')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest wait between two attempts')
 
     def handle(self, *args, **options):
         self.stdout.write('Wating for database...')
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = options['delay']
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, writing 1 second...')
-                time.sleep(1)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                break
+            except OperationalError as exc:
+                # a failed attempt may leave a broken connection behind
+                connection.close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s: '
+                        f'{exc}')
+                delay = min(delay, remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:.1f} seconds...')
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
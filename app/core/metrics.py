@@ -0,0 +1,184 @@
+"""Per-view request histograms kept in process memory
+
+Each thread records into its own shard, so recording never takes a lock
+and never contends with other threads; a scrape sums the shards of all
+threads. Stats are per process: with several workers every worker
+reports its own, told apart by the pid label.
+"""
+import bisect
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# name, help text, kind of buckets
+METRICS = (
+    ('request_duration_seconds', 'Total request latency', 'seconds'),
+    ('db_duration_seconds', 'Time spent in database queries', 'seconds'),
+    ('serialize_duration_seconds', 'Time spent serializing response data',
+     'seconds'),
+    ('render_duration_seconds', 'Time spent rendering responses', 'seconds'),
+    ('db_queries', 'Database queries per request', 'queries'),
+)
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+_slow = []
+_slow_lock = threading.Lock()
+_slow_counter = itertools.count()
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        # the only lock, taken once per thread
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+
+def get_buckets(kind):
+    return settings.METRICS_BUCKETS[kind]
+
+
+def observe(view, name, kind, value):
+    """Record value in the histogram name of view"""
+    shard = _shard()
+    key = (name, view)
+    counts = shard.get(key)
+    if counts is None:
+        # one count per bucket and +Inf, then the sum
+        counts = shard[key] = [0] * (len(get_buckets(kind)) + 2)
+    counts[bisect.bisect_left(get_buckets(kind), value)] += 1
+    counts[-1] += value
+
+
+def record(view, duration, db_duration, serialize_duration,
+           render_duration, queries):
+    """Record the stats of a request to view"""
+    for (name, help_text, kind), value in zip(
+            METRICS, (duration, db_duration, serialize_duration,
+                      render_duration, queries)):
+        observe(view, name, kind, value)
+
+
+@contextmanager
+def serializing(request):
+    """Count the block as serialization time of request
+
+    A block inside another, such as a nested serializer or the items of
+    a list serializer, is counted once.
+    """
+    stats = getattr(request, '_metrics', None)
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializing = False
+        stats.serialize_duration += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """Count the representation of a serializer as serialization time
+
+    DRF builds serializer.data inside the view, before the response is
+    rendered, so it is timed apart from the renderer.
+    """
+
+    def to_representation(self, instance):
+        with serializing(self.context.get('request')):
+            return super().to_representation(instance)
+
+
+def collect():
+    """Return the histograms of all threads summed, by (name, view)"""
+    totals = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, counts in list(shard.items()):
+            total = totals.setdefault(key, [0] * len(counts))
+            for index, count in enumerate(list(counts)):
+                total[index] += count
+    return totals
+
+
+def clear():
+    with _shards_lock:
+        for shard in _shards:
+            shard.clear()
+    with _slow_lock:
+        _slow.clear()
+
+
+def escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def render_prometheus():
+    """Return the histograms in the Prometheus text exposition format"""
+    totals = collect()
+    pid = os.getpid()
+    lines = []
+    for name, help_text, kind in METRICS:
+        metric = f'{settings.METRICS_PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        bounds = [str(bound) for bound in get_buckets(kind)] + ['+Inf']
+        for (key, view), counts in sorted(totals.items()):
+            if key != name:
+                continue
+            labels = f'view="{escape(view)}",pid="{pid}"'
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{labels}}} {counts[-1]:g}')
+            lines.append(f'{metric}_count{{{labels}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_slow(duration):
+    """Return whether a request of duration is among the slowest"""
+    if not settings.METRICS_SLOW_REQUESTS:
+        return False
+    # read without the lock; a stale minimum only costs a sample
+    return len(_slow) < settings.METRICS_SLOW_REQUESTS or \
+        duration > _slow[0][0]
+
+
+def sample_slow(duration, sample):
+    """Keep sample if its request is among the slowest of the process
+
+    Return whether it was kept.
+    """
+    with _slow_lock:
+        entry = (duration, next(_slow_counter), sample)
+        if len(_slow) < settings.METRICS_SLOW_REQUESTS:
+            heapq.heappush(_slow, entry)
+        elif duration > _slow[0][0]:
+            heapq.heapreplace(_slow, entry)
+        else:
+            return False
+    return True
+
+
+def slow_requests():
+    """Return the kept samples, slowest first"""
+    with _slow_lock:
+        return [sample for duration, order, sample
+                in sorted(_slow, reverse=True)]
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """Database, serialization and rendering time of a request"""
+
+    def __init__(self, keep_sql):
+        self.keep_sql = keep_sql
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serialize_duration = 0.0
+        self.serializing = False
+        self.render_duration = 0.0
+        self.render_started = None
+        self.sql = []
+
+    def execute(self, execute, sql, params, many, context):
+        """Execute wrapper timing the queries of the request"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_duration += duration
+            if self.keep_sql:
+                self.sql.append((duration, sql))
+
+    def rendered(self, response):
+        self.render_duration += time.perf_counter() - self.render_started
+
+
+class MetricsMiddleware:
+    """Record query count and timings of each request per view name
+
+    Enabled by METRICS_ENABLED and exposed by the metrics view. Requests
+    that do not resolve to a view are recorded as '<unresolved>'.
+    Serialization is the representation of the serializers using
+    core.metrics.TimedSerializerMixin, including the queries it makes,
+    and rendering is the renderer of DRF responses. Streamed responses
+    are recorded when the view returns them, so the queries and time of
+    their content are left out. With METRICS_SLOW_REQUESTS set, the SQL
+    of the slowest requests of the process is logged.
+
+    Under ASGI the middleware runs async, so async views stay async, and
+    records no database time: the queries run on other threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = request._metrics = RequestStats(
+            keep_sql=bool(settings.METRICS_SLOW_REQUESTS))
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(stats.execute))
+            response = self.get_response(request)
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats = request._metrics = RequestStats(keep_sql=False)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.finish(request, response, stats, started)
+        return response
+
+    def finish(self, request, response, stats, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        metrics.record(view, duration, stats.db_duration,
+                       stats.serialize_duration, stats.render_duration,
+                       stats.queries)
+        if metrics.is_slow(duration):
+            self.sample(request, response, view, duration, stats)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this returns
+        stats = request._metrics
+        stats.render_started = time.perf_counter()
+        response.add_post_render_callback(stats.rendered)
+        return response
+
+    def sample(self, request, response, view, duration, stats):
+        sample = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': [{'duration_ms': round(query * 1000, 2), 'sql': sql}
+                        for query, sql in stats.sql],
+        }
+        if metrics.sample_slow(duration, sample):
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries\n%s',
+                request.method, request.path, view, duration * 1000,
+                stats.queries, '\n'.join(
+                    f'  {query["duration_ms"]:.1f} ms  {query["sql"]}'
+                    for query in sample['queries']))
+
+
+class ReplicaMiddleware:
+    """Send the reads of safe requests to a database replica
+
+    Enabled when DB_REPLICAS lists replica aliases, and used with
+    core.routers.ReplicaRouter. GET, HEAD and OPTIONS requests read from
+    one replica picked at random, unless their client made another
+    request in the last DB_REPLICA_PIN_SECONDS: those, and every read of
+    other requests, go to the primary.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        alias, key = self.route(request)
+        token = routers.read_from(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset(token)
+        return self.finish(request, response, alias, key)
+
+    async def __acall__(self, request):
+        alias, key = self.route(request)
+        token = routers.read_from(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset(token)
+        return self.finish(request, response, alias, key)
+
+    def route(self, request):
+        """Return the alias to read from and the pin key of the client"""
+        key = routers.client_key(request)
+        if request.method in self.safe_methods and \
+                not routers.is_pinned(key):
+            return random.choice(settings.DB_REPLICAS), key
+        return DEFAULT_DB_ALIAS, key
+
+    def finish(self, request, response, alias, key):
+        if request.method not in self.safe_methods and key is not None:
+            routers.pin(key)
+        if response.streaming:
+            response.streaming_content = routers.reading_from(
+                alias, response.streaming_content)
+        return response
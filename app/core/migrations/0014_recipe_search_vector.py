@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:05
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# The GIN index and the backfill only exist on PostgreSQL; other backends
+# keep the column empty and search with substring matching.
+NAMES_SQL = '''
+    coalesce((SELECT string_agg(a.name, ' ')
+              FROM core_{model} a
+              JOIN core_recipe_{field} r ON r.{model}_id = a.id
+              WHERE r.recipe_id = core_recipe.id), '')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    schema_editor.execute(
+        'UPDATE core_recipe SET search_vector = '
+        'setweight(to_tsvector(%s::regconfig, title), \'A\') || '
+        'setweight(to_tsvector(%s::regconfig, ' + NAMES_SQL.format(
+            model='tag', field='tags') + '), \'B\') || '
+        'setweight(to_tsvector(%s::regconfig, ' + NAMES_SQL.format(
+            model='ingredient', field='ingredients') + '), \'B\')',
+        params=[config, config, config],
+    )
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_idx ON core_recipe '
+        'USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_img_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='summary',
+            field=models.JSONField(editable=False, null=True),
+        ),
+    ]
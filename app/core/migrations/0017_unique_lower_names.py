@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+# Django 3.2 cannot declare unique functional constraints, so the indexes
+# are created with SQL. PostgreSQL and SQLite both support them.
+MODELS = (('tag', 'tags'), ('ingredient', 'ingredients'))
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients of a user whose names differ in case
+
+    The oldest object of a name is kept and takes over the recipes of the
+    others. The summaries of those recipes are cleared, to be filled
+    again when listed or by rebuild_recipe_summaries.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in MODELS:
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field).remote_field.through
+        target = f'{model_name}_id'
+        duplicates = model.objects.annotate(
+            lower_name=Lower('name'),
+        ).values('user_id', 'lower_name').annotate(
+            count=Count('id'), keep=Min('id'),
+        ).filter(count__gt=1)
+        for duplicate in duplicates:
+            merged = list(model.objects.annotate(
+                lower_name=Lower('name'),
+            ).filter(
+                user_id=duplicate['user_id'],
+                lower_name=duplicate['lower_name'],
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+            rows = through.objects.filter(**{f'{target}__in': merged})
+            recipe_ids = set(rows.values_list('recipe_id', flat=True))
+            having = set(through.objects.filter(**{
+                target: duplicate['keep'], 'recipe_id__in': recipe_ids,
+            }).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(**{'recipe_id': recipe_id, target: duplicate['keep']})
+                for recipe_id in recipe_ids - having
+            ])
+            rows.delete()
+            model.objects.filter(id__in=merged).delete()
+            Recipe.objects.filter(id__in=recipe_ids).update(summary=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_recipe_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names,
+                             migrations.RunPython.noop),
+    ] + [
+        migrations.RunSQL(
+            f'CREATE UNIQUE INDEX core_{model}_user_lower_name_uniq '
+            f'ON core_{model} (user_id, lower(name))',
+            f'DROP INDEX core_{model}_user_lower_name_uniq',
+        )
+        for model, field in MODELS
+    ]
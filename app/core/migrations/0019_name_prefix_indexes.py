@@ -0,0 +1,40 @@
+from django.db import migrations
+
+MODELS = ('tag', 'ingredient')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # A C collation orders by bytes, so the index serves both a LIKE
+    # prefix on lower(name) and the ordering of the autocomplete query.
+    # Other backends have no such index and scan the user's rows.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model in MODELS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            f'core_{model}_user_name_prefix_idx '
+            f'ON core_{model} (user_id, (lower(name) COLLATE "C"))'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model in MODELS:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS '
+            f'core_{model}_user_name_prefix_idx'
+        )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0018_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
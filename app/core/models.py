@@ -1,4 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, \
+    transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.signals import post_save
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from app import settings
@@ -12,8 +18,8 @@ def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image"""
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
-    return os.path.join()
 
+    return os.path.join('uploads/recipe/', filename)
 
 
 class UserManager(BaseUserManager):
@@ -59,6 +65,88 @@ class UserManager(BaseUserManager):
         return user
 
 
+class NameManager(models.Manager):
+    """Manager of tags and ingredients, unique per user and lower(name)"""
+
+    # on PostgreSQL a single upsert returns new and existing rows alike
+    UPSERT_SQL = '''
+        INSERT INTO {table} (user_id, name, updated_at)
+        SELECT DISTINCT ON (lower(name)) %s, name, %s
+        FROM unnest(%s::varchar[]) WITH ORDINALITY AS names(name, position)
+        ORDER BY lower(name), position
+        ON CONFLICT (user_id, lower(name))
+        DO UPDATE SET name = {table}.name
+        RETURNING id, name, updated_at, xmax = 0
+    '''
+
+    def get_or_create_name(self, user, name):
+        """Return (obj, created) for the object of user named name
+
+        Names match case-insensitively, as the unique index does.
+        """
+        objs, created = self.get_or_create_names(user, [name])
+        return objs[name.lower()], bool(created)
+
+    def get_or_create_names(self, user, names):
+        """Return the objects of user named names, creating missing ones
+
+        Return (objs, created), objs mapping each lower-cased name to its
+        object and created listing the new objects. post_save is sent for
+        the new objects, as for saved ones.
+        """
+        if not names:
+            return {}, []
+        db = router.db_for_write(self.model)
+        if connections[db].vendor == 'postgresql':
+            objs, created = self._upsert_names(db, user, names)
+        else:
+            objs, created = self._get_or_insert_names(db, user, names)
+        return {obj.name.lower(): obj for obj in objs}, created
+
+    def _upsert_names(self, db, user, names):
+        sql = self.UPSERT_SQL.format(table=self.model._meta.db_table)
+        with connections[db].cursor() as cursor:
+            cursor.execute(sql, [user.pk, timezone.now(), list(names)])
+            rows = cursor.fetchall()
+        objs, created = [], []
+        for pk, name, updated_at, inserted in rows:
+            obj = self.model(pk=pk, user=user, name=name,
+                             updated_at=updated_at)
+            obj._state.adding = False
+            obj._state.db = db
+            objs.append(obj)
+            if inserted:
+                created.append(obj)
+                post_save.send(sender=self.model, instance=obj, created=True,
+                               update_fields=None, raw=False, using=db)
+        return objs, created
+
+    def _get_or_insert_names(self, db, user, names):
+        wanted = {}
+        for name in names:
+            wanted.setdefault(name.lower(), name)
+        # SQLite only lower-cases ASCII, so exact names are matched too
+        objs = list(self.using(db).filter(user=user).annotate(
+            lower_name=Lower('name'),
+        ).filter(Q(lower_name__in=wanted) | Q(name__in=names)))
+        for obj in objs:
+            wanted.pop(obj.name.lower(), None)
+        created = []
+        for name in wanted.values():
+            obj = self.model(user=user, name=name)
+            try:
+                with transaction.atomic(using=db):
+                    obj.save(force_insert=True, using=db)
+            except IntegrityError:
+                # created concurrently since the lookup
+                objs.append(self.using(db).annotate(
+                    lower_name=Lower('name'),
+                ).get(user=user, lower_name=name.lower()))
+                continue
+            created.append(obj)
+        return objs + created, created
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(max_length=25)
     last_name = models.CharField(max_length=25)
@@ -96,6 +184,17 @@ class Tag(models.Model):
     name = models.CharField(max_length=50)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # names are unique per user regardless of case, by an index on
+    # (user_id, lower(name)) created by migration 0017
+    objects = NameManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_tag_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -106,12 +205,32 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=50)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # names are unique per user regardless of case, by an index on
+    # (user_id, lower(name)) created by migration 0017
+    objects = NameManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_ingredient_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
+    IMG_PENDING = 'pending'
+    IMG_READY = 'ready'
+    IMG_FAILED = 'failed'
+    IMG_STATUS_CHOICES = [
+        (IMG_PENDING, 'Pending'),
+        (IMG_READY, 'Ready'),
+        (IMG_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
@@ -121,6 +240,27 @@ class Recipe(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     img = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # thumbnails of img are made by recipe.images after the upload
+    img_status = models.CharField(max_length=10, blank=True,
+                                  choices=IMG_STATUS_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+    # title and tag/ingredient names, GIN-indexed on PostgreSQL by
+    # migration 0014 and kept current by recipe.signals
+    search_vector = SearchVectorField(null=True, editable=False)
+    # list representation with tag and ingredient names, kept current by
+    # recipe.signals and served by the recipe list (recipe.summaries)
+    summary = models.JSONField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_recipe_user_id_idx'),
+            # range filters and orderings of the recipe list
+            models.Index(fields=['user', 'price', 'id'],
+                         name='core_recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='core_recipe_user_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,64 @@
+"""JSON renderer using orjson when it is installed
+
+orjson is an optional dependency; without it FastJSONRenderer is DRF's
+JSONRenderer.
+"""
+import math
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def has_non_finite(data):
+    """Return whether data holds a NaN or infinite float"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer writing compact output with orjson
+
+    The bytes are those of JSONRenderer: compact, UTF-8 with U+2028 and
+    U+2029 escaped, and values orjson has no native form for (Decimal,
+    datetime, lazy strings) converted by DRF's encoder. orjson writes NaN
+    and Infinity as null, so output holding a null is checked for them
+    and, when it does, left to JSONRenderer, which raises in strict mode.
+    Indented output, ASCII-only settings and integers beyond 64 bits are
+    left to JSONRenderer as well.
+    """
+    options = 0
+
+    def __init__(self):
+        if orjson is not None:
+            self.options = (orjson.OPT_NON_STR_KEYS
+                            | orjson.OPT_PASSTHROUGH_DATETIME)
+            self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default,
+                               option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # as JSONRenderer does, to output a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028') \
+            .replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,113 @@
+"""Routing of reads to the database replicas of DB_REPLICAS
+
+ReplicaMiddleware picks the database the reads of each request go to:
+a random replica for GET, HEAD and OPTIONS requests, and the primary for
+other requests and for clients that made one in the last
+DB_REPLICA_PIN_SECONDS, so they read their own writes. Clients are told
+apart by their Authorization header or session cookie, which belong to
+one user. Writes, reads in a transaction and reads outside a request go
+to the primary.
+
+A replica may lag behind the version tokens of recipe.cache, which are
+replaced on every write, so whatever is cached under a version is read
+from the primary.
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# database alias the reads of the current request go to
+_read_alias = ContextVar('read_alias', default=DEFAULT_DB_ALIAS)
+
+
+def read_from(alias):
+    """Send the reads of the current context to alias
+
+    Returns the token that reset() takes to undo it.
+    """
+    return _read_alias.set(alias)
+
+
+def reset(token):
+    _read_alias.reset(token)
+
+
+@contextmanager
+def primary():
+    """Send the reads of the block to the primary"""
+    token = read_from(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        reset(token)
+
+
+def reading_replica():
+    """Return whether the reads of the current context go to a replica"""
+    return _read_alias.get() != DEFAULT_DB_ALIAS
+
+
+def reading_from(alias, iterable):
+    """Iterate over iterable with its reads sent to alias
+
+    For streamed responses, whose content is read after the middleware
+    returned.
+    """
+    iterator = iter(iterable)
+    while True:
+        token = read_from(alias)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            reset(token)
+        yield item
+
+
+def client_key(request):
+    """Return the pin cache key of the client of request or None"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    digest = hashlib.sha256(credential.encode('utf-8')).hexdigest()
+    return f'db:pinned:{digest}'
+
+
+def is_pinned(key):
+    return key is not None and \
+        caches[settings.DB_REPLICA_PIN_CACHE].get(key) is not None
+
+
+def pin(key):
+    """Send the reads of a client to the primary for a while"""
+    caches[settings.DB_REPLICA_PIN_CACHE].set(
+        key, True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """Read from the database picked by ReplicaMiddleware"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias != DEFAULT_DB_ALIAS and \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # rows written by the transaction are not on the replicas
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive the schema through replication
+        return db == DEFAULT_DB_ALIAS
@@ -1,23 +1,97 @@
+import io
+import json
+import os
+import shutil
+import tempfile
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core.models import Recipe
+from core.utils import percentile
+
 
 class CommandTests(TestCase):
 
+    def setUp(self):
+        patcher = patch('core.management.commands.wait_for_db.connections')
+        self.connection = patcher.start().__getitem__.return_value
+        self.addCleanup(patcher.stop)
+        self.execute = \
+            self.connection.cursor.return_value.__enter__.return_value.execute
+
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        call_command('wait_for_db', stdout=io.StringIO())
+
+        self.execute.assert_called_once_with('SELECT 1')
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         """Test waiting for db:"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        self.execute.side_effect = [OperationalError] * 5 + [None]
+
+        call_command('wait_for_db', stdout=io.StringIO())
+
+        self.assertEqual(self.execute.call_count, 6)
+        # the delay doubles between attempts
+        self.assertEqual([call.args[0] for call in ts.call_args_list],
+                         [0.1, 0.2, 0.4, 0.8, 1.6])
+        self.assertEqual(self.connection.close.call_count, 5)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test that the command fails once the timeout has passed"""
+        self.execute.side_effect = OperationalError('refused')
+
+        with self.assertRaisesMessage(CommandError, 'refused'):
+            call_command('wait_for_db', timeout=0, stdout=io.StringIO())
+        ts.assert_not_called()
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.output = os.path.join(self.dir, 'baseline.json')
+
+    def benchmark(self, **options):
+        call_command('benchmark', recipes=[3], tags=5, ingredients=10,
+                     iterations=2, stdout=io.StringIO(), **options)
+
+    def test_percentile(self):
+        """Test percentiles interpolated between the sorted values"""
+        self.assertEqual(percentile([4, 1, 3, 2, 5], 50), 3)
+        self.assertAlmostEqual(percentile([1, 2, 3, 4, 5], 99), 4.96)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_benchmark_baseline(self):
+        """Test that results are written and the fixtures rolled back"""
+        self.benchmark(output=self.output)
+
+        with open(self.output) as file:
+            report = json.load(file)
+        self.assertEqual(report['meta']['iterations'], 2)
+        self.assertEqual(
+            set(report['results']['3:recipe-list']),
+            {'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_peak_kb'})
+        self.assertIn('3:token', report['results'])
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_compare_flags_added_queries(self):
+        """Test that comparing with a baseline flags added queries"""
+        self.benchmark(output=self.output)
+        with open(self.output) as file:
+            report = json.load(file)
+        report['results']['3:recipe-list']['queries'] -= 1
+        with open(self.output, 'w') as file:
+            json.dump(report, file)
+
+        with self.assertRaisesMessage(CommandError, '3:recipe-list'):
+            self.benchmark(compare=self.output, threshold=100)
@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock, patch
+
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.db import close_unusable_connections
+
+HEALTH_URL = reverse('health')
+
+
+class ConnectionHealthCheckTests(SimpleTestCase):
+
+    def make_connection(self, usable, in_atomic_block=False):
+        conn = MagicMock(in_atomic_block=in_atomic_block)
+        conn.is_usable.return_value = usable
+        return conn
+
+    def test_unusable_connection_closed(self):
+        """Test that a dead persistent connection is closed"""
+        dead = self.make_connection(usable=False)
+        alive = self.make_connection(usable=True)
+        with patch('core.db.connections') as connections:
+            connections.all.return_value = [dead, alive]
+            close_unusable_connections()
+
+        dead.close.assert_called_once()
+        alive.close.assert_not_called()
+
+    def test_connection_in_transaction_kept(self):
+        """Test that a connection inside a transaction is left alone"""
+        conn = self.make_connection(usable=False, in_atomic_block=True)
+        with patch('core.db.connections') as connections:
+            connections.all.return_value = [conn]
+            close_unusable_connections()
+
+        conn.close.assert_not_called()
+
+
+class HealthViewTests(TestCase):
+
+    def test_health_without_details(self):
+        """Test that only the status is public without metrics"""
+        res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_health_reports_connections(self):
+        """Test that the health view queries and reports each database"""
+        res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, 200)
+        default = res.json()['databases']['default']
+        self.assertEqual(default['status'], 'ok')
+        self.assertGreaterEqual(default['open'], 1)
+        self.assertGreaterEqual(default['opened'], default['open'])
+        self.assertIn('max_age', default)
+
+    def test_health_unavailable_database(self):
+        """Test that a database not answering makes the view fail"""
+        with patch('core.db.check', side_effect=OperationalError), \
+                self.assertLogs('app.views', 'ERROR'):
+            res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['status'], 'unavailable')
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_health_unavailable_replica(self):
+        """Test that a replica not answering is reported but ready"""
+        def check(alias):
+            if alias == 'replica1':
+                raise OperationalError()
+            return 0.001
+
+        connections = MagicMock()
+        connections.__iter__.return_value = ['default', 'replica1']
+        with patch('app.views.connections', connections), \
+                patch('core.db.check', side_effect=check), \
+                patch('core.db.pool_stats', return_value={}), \
+                self.assertLogs('app.views', 'ERROR'):
+            res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok', 'databases': {
+            'default': {'status': 'ok', 'latency_ms': 1.0},
+            'replica1': {'status': 'unavailable'},
+        }})
@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+
+
+def sample_user(email='test@example.com', username='test'):
+    return get_user_model().objects.create_user(
+        first_name='test',
+        last_name='test',
+        username=username,
+        phone_number='123456',
+        email=email,
+        password='test1234'
+    )
+
+
+class ImportRecipesTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_ndjson(self, records):
+        return self.write('recipes.ndjson', ''.join(
+            json.dumps(record) + '\n' for record in records))
+
+    def import_recipes(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        """Test importing recipes with names, deduplicating them"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        path = self.write_ndjson([
+            {'title': 'Cake', 'price': '5.00', 'time_minutes': 30,
+             'tags': ['Vegan', 'Dessert'], 'ingredients': ['Salt']},
+            {'title': 'Salad', 'price': 2.5, 'time_minutes': 5,
+             'link': 'https://example.com',
+             'tags': [{'id': 99, 'name': 'Vegan'}],
+             'ingredients': ['Salt', 'Salt']},
+        ])
+
+        out, err = self.import_recipes(path, batch_size=1)
+
+        self.assertIn('Imported 2 recipes', out)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        cake = Recipe.objects.get(title='Cake')
+        self.assertEqual([t.name for t in cake.tags.order_by('id')],
+                         ['Vegan', 'Dessert'])
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(list(salad.tags.all()), [vegan])
+        self.assertEqual(salad.ingredients.count(), 1)
+        self.assertEqual(str(salad.price), '2.50')
+        self.assertEqual(salad.summary['tags'],
+                         [{'id': vegan.id, 'name': 'Vegan'}])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_csv(self):
+        """Test importing the CSV a recipe export writes"""
+        path = self.write(
+            'recipes.csv',
+            'id,title,price,link,ingredients,tags,time_minutes\r\n'
+            '1,Cake,5.00,,Flour|Salt,Dessert,30\r\n')
+
+        self.import_recipes(path)
+
+        cake = Recipe.objects.get(user=self.user)
+        self.assertEqual(cake.title, 'Cake')
+        self.assertEqual(cake.link, '')
+        self.assertEqual(
+            sorted(cake.ingredients.values_list('name', flat=True)),
+            ['Flour', 'Salt'])
+
+    def test_invalid_records_skipped(self):
+        """Test that invalid records are reported and skipped"""
+        path = self.write_ndjson([
+            {'title': 'Cake', 'price': 'free', 'time_minutes': 30},
+            {'title': 'Salad', 'price': 2, 'time_minutes': 5},
+            ['not', 'an', 'object'],
+        ])
+
+        out, err = self.import_recipes(path)
+
+        self.assertIn('skipped 2 invalid records', out)
+        self.assertIn('Record 1 skipped', err)
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Salad'])
+
+    def test_malformed_records_skipped(self):
+        """Test that a bad JSON line, relation value or name is skipped"""
+        path = self.write('recipes.ndjson', ''.join([
+            '{"title": "Cake", "price": 5, \n',
+            json.dumps({'title': 'Soup', 'price': 3, 'time_minutes': 10,
+                        'tags': 5}) + '\n',
+            json.dumps({'title': 'Salad', 'price': 2, 'time_minutes': 5,
+                        'tags': [{'id': 1}]}) + '\n',
+            json.dumps({'title': 'Pie', 'price': 6, 'time_minutes': 50,
+                        'ingredients': ['a' * 51]}) + '\n',
+            json.dumps({'title': 'Stew', 'price': 4, 'time_minutes': 60,
+                        'tags': ['Winter']}) + '\n',
+        ]))
+
+        out, err = self.import_recipes(path)
+
+        self.assertIn('skipped 4 invalid records', out)
+        self.assertIn('Record 1 skipped', err)
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Stew'])
+
+    def test_malformed_json_array(self):
+        """Test that a JSON array syntax error stops the import"""
+        path = self.write('recipes.json', '[{"title": "Cake"} {')
+
+        with self.assertRaises(CommandError):
+            self.import_recipes(path)
+
+    def test_resume_from_checkpoint(self):
+        """Test that an interrupted import continues after its checkpoint"""
+        path = self.write_ndjson([
+            {'title': f'Recipe {i}', 'price': 1, 'time_minutes': i}
+            for i in range(5)
+        ])
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump({'size': os.path.getsize(path), 'records': 3}, file)
+
+        out, err = self.import_recipes(path, batch_size=2)
+
+        self.assertIn('Resuming after 3 records', out)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 3', 'Recipe 4'])
+
+    def test_checkpoint_of_changed_file(self):
+        """Test that a checkpoint of another file version is refused"""
+        path = self.write_ndjson([{'title': 'Cake', 'price': 1,
+                                   'time_minutes': 1}])
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump({'size': 1, 'records': 1}, file)
+
+        with self.assertRaises(CommandError):
+            self.import_recipes(path)
+
+        self.import_recipes(path, restart=True)
+        self.assertEqual(Recipe.objects.count(), 1)
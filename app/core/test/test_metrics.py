@@ -0,0 +1,124 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            first_name='test',
+            last_name='test',
+            username='test',
+            phone_number='123456',
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+
+    def test_request_recorded_per_view(self):
+        """Test that a request is recorded under its view name"""
+        Recipe.objects.create(
+            user=self.user, title='Cake', time_minutes=30, price=5)
+
+        with self.assertNumQueries(1):
+            self.client.get(RECIPES_URL)
+
+        totals = metrics.collect()
+        queries = totals[('db_queries', 'recipe:recipe-list')]
+        self.assertEqual(sum(queries[:-1]), 1)
+        self.assertEqual(queries[-1], 1)
+        for name in ('request_duration_seconds', 'db_duration_seconds',
+                     'serialize_duration_seconds', 'render_duration_seconds'):
+            self.assertGreater(totals[(name, 'recipe:recipe-list')][-1], 0)
+
+    def test_serialization_timed(self):
+        """Test that building serializer.data in the view is recorded"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Cake', time_minutes=30, price=5)
+
+        self.client.get(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        totals = metrics.collect()
+        serialize = totals[
+            ('serialize_duration_seconds', 'recipe:recipe-detail')]
+        self.assertEqual(sum(serialize[:-1]), 1)
+        self.assertGreater(serialize[-1], 0)
+
+    def test_unresolved_request_recorded(self):
+        """Test that requests not matching a URL are recorded together"""
+        self.client.get('/not-found')
+
+        self.assertIn(('request_duration_seconds', '<unresolved>'),
+                      metrics.collect())
+
+    def test_threads_summed(self):
+        """Test that the shards of all threads are summed"""
+        thread = threading.Thread(
+            target=metrics.record, args=('view', 0.2, 0.1, 0.02, 0.05, 3))
+        thread.start()
+        thread.join()
+        metrics.record('view', 0.3, 0.1, 0.02, 0.05, 4)
+
+        totals = metrics.collect()
+        self.assertEqual(sum(totals[('db_queries', 'view')][:-1]), 2)
+        self.assertEqual(totals[('db_queries', 'view')][-1], 7)
+
+    def test_prometheus_format(self):
+        """Test the exposition of the histograms"""
+        metrics.record('recipe:recipe-list', 0.02, 0.01, 0.002, 0.005, 3)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE app_request_duration_seconds histogram', body)
+        labels = 'view="recipe:recipe-list",pid="'
+        self.assertIn(f'app_db_queries_bucket{{{labels}', body)
+        self.assertRegex(
+            body, r'app_db_queries_bucket\{view="recipe:recipe-list",'
+                  r'pid="\d+",le="2"\} 0\n')
+        self.assertRegex(
+            body, r'app_db_queries_bucket\{view="recipe:recipe-list",'
+                  r'pid="\d+",le="3"\} 1\n')
+        self.assertRegex(
+            body, r'app_request_duration_seconds_sum\{view="recipe:'
+                  r'recipe-list",pid="\d+"\} 0.02\n')
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        """Test that nothing is recorded or served when disabled"""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(metrics.collect(), {})
+
+    @override_settings(METRICS_SLOW_REQUESTS=1)
+    def test_slow_request_sql_logged(self):
+        """Test that the SQL of the slowest request is logged"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(RECIPES_URL)
+
+        self.assertIn('Slow request GET /api/recipe/recipes/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+        sample, = metrics.slow_requests()
+        self.assertEqual(sample['view'], 'recipe:recipe-list')
+        self.assertEqual(len(sample['queries']), 1)
@@ -1,6 +1,7 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from .. import models
 from core import models
 # Create your tests here.
 
@@ -133,12 +134,13 @@ class UserModel(TestCase):
         )
 
         self.assertEqual(str(recipe), recipe.title)
-    
+
     @patch('uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test that image is saved in the correct location"""
         uuid = 'test-uuid'
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'myiamge.jpg')
-        
+
         exp_path = f'uploads/recipe/{uuid}.jpg'
+        self.assertEqual(file_path, exp_path)
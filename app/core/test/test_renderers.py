@@ -0,0 +1,89 @@
+import datetime
+import io
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('title', 'Crème brûlée \u2028 "quoted" \u2029 \\ </script>'),
+    ('price', Decimal('5.00')),
+    ('created', datetime.datetime(
+        2021, 5, 29, 13, 41, 7, 123456, tzinfo=datetime.timezone.utc)),
+    ('day', datetime.date(2021, 5, 29)),
+    ('label', gettext_lazy('Invalid cursor')),
+    ('tags', [1, 2, 3]),
+    ('nested', {1: None, 'ok': True, 'empty': []}),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_output_matches_json_renderer(self):
+        """Test that the output is byte for byte JSONRenderer's"""
+        self.assertEqual(FastJSONRenderer().render(SAMPLE),
+                         JSONRenderer().render(SAMPLE))
+        self.assertEqual(FastJSONRenderer().render([SAMPLE, SAMPLE]),
+                         JSONRenderer().render([SAMPLE, SAMPLE]))
+
+    def test_indent_falls_back(self):
+        """Test that indented output is JSONRenderer's"""
+        media_type = 'application/json; indent=4'
+        self.assertEqual(FastJSONRenderer().render(SAMPLE, media_type),
+                         JSONRenderer().render(SAMPLE, media_type))
+
+    def test_large_integer_falls_back(self):
+        """Test that integers orjson cannot write are rendered"""
+        data = {'big': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_non_finite_float_raises(self):
+        """Test that NaN and Infinity are refused as by JSONRenderer"""
+        for value in (float('nan'), float('inf'), -float('inf')):
+            data = {'ok': None, 'nested': [{'value': value}]}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(data)
+
+        data = {'ok': None, 'value': 1.5}
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_without_orjson(self):
+        """Test that the renderer works when orjson is not installed"""
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(SAMPLE),
+                             JSONRenderer().render(SAMPLE))
+
+    def test_none_renders_empty(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), parser_context={})
+
+    def test_parse_matches_json_parser(self):
+        """Test that bodies parse as with JSONParser"""
+        body = JSONRenderer().render(
+            [{'title': 'Crème \u2028', 'tags': [1, 2], 'price': '5.00'}])
+        self.assertEqual(self.parse(FastJSONParser(), body),
+                         self.parse(JSONParser(), body))
+
+    def test_invalid_json(self):
+        """Test that invalid bodies raise ParseError"""
+        for body in (b'{"title": ', b'[NaN]'):
+            with self.assertRaises(ParseError):
+                self.parse(FastJSONParser(), body)
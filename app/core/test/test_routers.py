@@ -0,0 +1,154 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import routers
+from core.middleware import ReplicaMiddleware
+from core.models import Recipe, Tag
+from recipe import async_views, autocomplete
+
+REPLICAS = ['replica1', 'replica2']
+
+
+def read_alias():
+    return router.db_for_read(Recipe)
+
+
+@override_settings(DB_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Test the database the reads and writes of requests go to"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.aliases = []
+        cache.clear()
+
+    def get_response(self, request):
+        self.aliases.append(read_alias())
+        return HttpResponse()
+
+    def request(self, method, token=None, get_response=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        request = getattr(self.factory, method)('/api/recipe/', **headers)
+        middleware = ReplicaMiddleware(get_response or self.get_response)
+        return middleware(request)
+
+    def test_reads_outside_requests_from_primary(self):
+        """Test that commands and tasks read from the primary"""
+        self.assertEqual(read_alias(), 'default')
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    def test_safe_requests_read_from_replica(self):
+        """Test that GET requests read from a replica and others not"""
+        self.request('get', token='a')
+        self.request('post')
+        self.request('delete')
+
+        self.assertIn(self.aliases[0], REPLICAS)
+        self.assertEqual(self.aliases[1:], ['default', 'default'])
+        self.assertEqual(read_alias(), 'default')
+
+    def test_client_pinned_after_write(self):
+        """Test that a client reads from the primary after a write"""
+        self.request('patch', token='a')
+        self.request('get', token='a')
+        self.request('get', token='b')
+
+        self.assertEqual(self.aliases[:2], ['default', 'default'])
+        self.assertIn(self.aliases[2], REPLICAS)
+
+        cache.clear()
+        self.request('get', token='a')
+        self.assertIn(self.aliases[3], REPLICAS)
+
+    def test_streamed_content_read_from_replica(self):
+        """Test that content streamed after the middleware keeps its db"""
+        def get_response(request):
+            return StreamingHttpResponse(
+                read_alias().encode() for index in range(2))
+
+        response = self.request('get', get_response=get_response)
+
+        self.assertIn(b''.join(response.streaming_content).decode(),
+                      [alias * 2 for alias in REPLICAS])
+
+    def test_async_queries_read_from_replica(self):
+        """Test that queries of the async views keep the request's db"""
+        async def view():
+            token = routers.read_from('replica2')
+            try:
+                return await async_views.run(read_alias)
+            finally:
+                routers.reset(token)
+
+        self.assertEqual(asyncio.run(view()), 'replica2')
+
+    @override_settings(DB_REPLICAS=[])
+    def test_not_used_without_replicas(self):
+        """Test that the middleware is left out without replicas"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(self.get_response)
+
+
+class ReplicaTransactionTests(TestCase):
+
+    def test_reads_in_transaction_from_primary(self):
+        """Test that reads in a transaction see its writes"""
+        token = routers.read_from('replica1')
+        try:
+            self.assertEqual(read_alias(), 'default')
+        finally:
+            routers.reset(token)
+
+
+class ReplicaCacheTests(TransactionTestCase):
+    """Test that what is cached under a version is read from the primary
+
+    The replica alias has no database in the tests, so a read sent to it
+    fails.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            first_name='test',
+            last_name='test',
+            username='test',
+            phone_number='123456',
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        autocomplete.index_cache.clear()
+        Tag.objects.create(user=self.user, name='Vegan')
+        token = routers.read_from('replica1')
+        self.addCleanup(routers.reset, token)
+
+    def test_cached_list_read_from_primary(self):
+        """Test that a list response stored in the cache reads the primary"""
+        res = self.client.get(reverse('recipe:tag-list'))
+
+        self.assertEqual(res.data['results'][0]['name'], 'Vegan')
+
+    def test_name_index_read_from_primary(self):
+        """Test that the autocomplete index is loaded from the primary"""
+        self.assertEqual(
+            [name for pk, name in autocomplete.complete(
+                Tag, self.user.pk, 'v', 10)],
+            ['Vegan'])
+
+    def test_recent_change_read_from_primary(self):
+        """Test that a response dated by a recent change reads the primary"""
+        res = self.client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('ETag', res)
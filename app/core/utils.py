@@ -0,0 +1,31 @@
+from django.db import connections, router
+
+
+def bulk_create(model, objs, batch_size=None):
+    """Insert objs in batches and set their primary keys
+
+    QuerySet.bulk_create only reads primary keys back on backends that
+    can return rows from a bulk insert (PostgreSQL). Elsewhere the objects
+    are inserted one by one, so callers can always rely on obj.pk.
+    """
+    db = router.db_for_write(model)
+    if connections[db].features.can_return_rows_from_bulk_insert:
+        return model.objects.using(db).bulk_create(
+            objs, batch_size=batch_size)
+    for obj in objs:
+        obj.save(force_insert=True, using=db)
+    return objs
+
+
+def percentile(values, percent):
+    """Return the percent-th percentile of values, interpolated linearly
+
+    statistics.quantiles needs Python 3.8.
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    index = int(position)
+    if index + 1 == len(values):
+        return values[index]
+    return values[index] + \
+        (values[index + 1] - values[index]) * (position - index)
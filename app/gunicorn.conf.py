@@ -0,0 +1,40 @@
+"""Gunicorn configuration for the production serving profile
+
+WSGI (default):  gunicorn app.wsgi
+ASGI:            GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+                 gunicorn app.asgi
+
+Every value can be overridden from the environment. To compare the two
+under load, run one of each and
+    python manage.py loadtest http://wsgi:8000 --async-url http://asgi:8000 \
+        --email ... --password ... --concurrency 256
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Each thread keeps its own database connection for DB_CONN_MAX_AGE, so
+# the database sees up to workers * threads connections per instance
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Keep connections from the front proxy open between requests
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Keep the worker heartbeat files, which the workers touch every second,
+# in memory: a slow container disk can make the arbiter kill busy workers.
+# Request bodies and uploads are not written there.
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -0,0 +1,200 @@
+"""Async versions of the recipe API list and retrieve endpoints
+
+Served under api/async/recipe/ and meant for ASGI workers. The Django 3.2
+ORM is synchronous, so every query runs on a bounded pool of threads,
+each keeping its own database connection, while the event loop only
+waits. The token lookup and the queries of a response do not depend on
+each other: the rows are selected through the token key, so the lookup,
+the page and the tag and ingredient ids of the page run concurrently,
+and rows are only returned once the token is known to be valid.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from core.models import Tag, Ingredient, Recipe
+from core.renderers import FastJSONRenderer
+from recipe import serializers
+from recipe.filters import (
+    assigned_to_recipe, filter_recipes, order_recipes, params_to_bool,
+)
+from recipe.mixins import related_pks
+from recipe.pagination import KeysetPagination
+from recipe.views import RecipeViewSet
+from user.authentication import CachedTokenAuthentication, token_cache
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # every thread holds a connection, so this bounds the
+            # connections of a worker process
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_ASYNC_DB_THREADS,
+                thread_name_prefix='recipe-async-db')
+    return _pool
+
+
+def _query(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # as request_finished does for the request thread
+        close_old_connections()
+
+
+async def run(func, *args):
+    """Run a function doing database queries on the query threads
+
+    It runs in a copy of the current context, which holds the database
+    picked by core.middleware.ReplicaMiddleware.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_pool(), functools.partial(context.run, _query, func, *args))
+
+
+async def authenticate(key):
+    """Return the user of token key, or raise AuthenticationFailed"""
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    user, token = await run(
+        CachedTokenAuthentication().authenticate_credentials, key)
+    return user
+
+
+def get_token_key(request):
+    """Return the key of a 'Token <key>' Authorization header or None"""
+    auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+    return auth[1]
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status,
+                        content_type='application/json')
+
+
+def token_view(view):
+    """Make an async GET view authenticated by an API token
+
+    The view is called with the token key and should await authenticate
+    along with its queries. API exceptions become error responses.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        try:
+            key = get_token_key(request)
+            if key is None:
+                raise exceptions.NotAuthenticated()
+            return await view(request, key, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = render({'detail': exc.detail}, exc.status_code)
+            if exc.status_code == 401:
+                response['WWW-Authenticate'] = 'Token'
+            return response
+    return wrapper
+
+
+def set_prefetched(recipe, field, objs):
+    """Fill the prefetch cache of a relation, as prefetch_related does"""
+    queryset = getattr(recipe, field).all()
+    queryset._result_cache = list(objs)
+    queryset._prefetch_done = True
+    recipe._prefetched_objects_cache[field] = queryset
+
+
+@token_view
+async def recipe_list(request, key):
+    request = Request(request)
+    paginator = KeysetPagination()
+    queryset = order_recipes(filter_recipes(
+        Recipe.objects.filter(user__auth_token__key=key),
+        request.query_params,
+    ), request.query_params).only(*RecipeViewSet.list_fields)
+    page = paginator.page_queryset(queryset, request)
+    recipe_ids = page.values('id')
+
+    user, recipes, tags, ingredients = await asyncio.gather(
+        authenticate(key),
+        run(list, page),
+        run(related_pks, Recipe, 'tags', recipe_ids),
+        run(related_pks, Recipe, 'ingredients', recipe_ids),
+    )
+
+    recipes = paginator.set_page(recipes)
+    for recipe in recipes:
+        recipe._prefetched_objects_cache = {}
+        set_prefetched(recipe, 'tags',
+                       [Tag(pk=pk) for pk in tags[recipe.pk]])
+        set_prefetched(recipe, 'ingredients',
+                       [Ingredient(pk=pk) for pk in ingredients[recipe.pk]])
+    data = serializers.RecipeSerializer(recipes, many=True).data
+    return render(paginator.get_paginated_response(data).data)
+
+
+@token_view
+async def recipe_detail(request, key, pk):
+    recipe = Recipe.objects.filter(user__auth_token__key=key, pk=pk).only(
+        *RecipeViewSet.list_fields, 'img', 'img_status')
+
+    user, recipe, tags, ingredients = await asyncio.gather(
+        authenticate(key),
+        run(recipe.first),
+        run(list, Tag.objects.filter(recipe=pk).only('id', 'name')
+            .order_by('id')),
+        run(list, Ingredient.objects.filter(recipe=pk).only('id', 'name')
+            .order_by('id')),
+    )
+    if recipe is None:
+        raise exceptions.NotFound()
+
+    recipe._prefetched_objects_cache = {}
+    set_prefetched(recipe, 'tags', tags)
+    set_prefetched(recipe, 'ingredients', ingredients)
+    return render(serializers.RecipeDetailSerializer(recipe).data)
+
+
+async def attr_list(request, key, model, serializer_class, recipe_field):
+    request = Request(request)
+    paginator = KeysetPagination()
+    queryset = model.objects.filter(user__auth_token__key=key)
+    if params_to_bool(request.query_params, 'assigned_only'):
+        queryset = queryset.filter(assigned_to_recipe(recipe_field))
+    page = paginator.page_queryset(
+        queryset.order_by('-name', '-id').only('id', 'name'), request)
+
+    user, objs = await asyncio.gather(authenticate(key), run(list, page))
+
+    data = serializer_class(paginator.set_page(objs), many=True).data
+    return render(paginator.get_paginated_response(data).data)
+
+
+@token_view
+async def tag_list(request, key):
+    return await attr_list(
+        request, key, Tag, serializers.TagSerializer, 'tags')
+
+
+@token_view
+async def ingredient_list(request, key):
+    return await attr_list(
+        request, key, Ingredient, serializers.IngredientSerializer,
+        'ingredients')
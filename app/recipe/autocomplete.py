@@ -0,0 +1,132 @@
+"""Prefix matching of tag and ingredient names for autocompletion
+
+Matches are the names of a user's tags or ingredients starting with a
+prefix, regardless of case, in lowercased name order. Each process keeps
+the sorted lowercased names of the (user, resource) pairs it served last,
+up to RECIPE_AUTOCOMPLETE_CACHE_NAMES names in total, and answers with a
+binary search. An entry is valid for the version token of its resource
+in recipe.cache, which every write replaces, so a change is seen by the
+next request.
+
+Without the cache the names are read from the database. On PostgreSQL
+migration 0019 indexes (user_id, lower(name) COLLATE "C"), which serves
+both the LIKE prefix and the ordering of the query.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Collate, Lower
+
+from core import routers
+from recipe import cache
+
+
+def name_key():
+    """Return the lowercased name in the collation of the prefix index"""
+    key = Lower('name')
+    if connection.vendor == 'postgresql':
+        # byte order, in which a LIKE prefix is a range of the index
+        key = Collate(key, 'C')
+    return key
+
+
+class NameIndex:
+    """Sorted lowercased names of the tags or ingredients of one user"""
+
+    def __init__(self, rows):
+        rows = sorted((name.lower(), pk, name) for pk, name in rows)
+        self.keys = [key for key, pk, name in rows]
+        self.names = [(pk, name) for key, pk, name in rows]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, prefix, limit):
+        """Return up to limit (id, name) pairs starting with prefix"""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = start
+        while end < min(start + limit, len(self.keys)) and \
+                self.keys[end].startswith(prefix):
+            end += 1
+        return self.names[start:end]
+
+
+class NameIndexCache:
+    """Thread-safe LRU map of name indexes with their version
+
+    maxsize bounds the names of all the indexes, so a few users with many
+    names take the memory of many users with few. An index larger than
+    maxsize is not cached.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return the index cached for key at version or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, index):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= len(entry[1])
+            if len(index) > self.maxsize:
+                return
+            self._entries[key] = (version, index)
+            self.size += len(index)
+            while self.size > self.maxsize:
+                version, index = self._entries.popitem(last=False)[1]
+                self.size -= len(index)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+index_cache = NameIndexCache(settings.RECIPE_AUTOCOMPLETE_CACHE_NAMES)
+
+
+def query(model, user_id, prefix, limit):
+    """Return the matches of prefix read from the database"""
+    return list(model.objects.filter(user_id=user_id).alias(
+        key=name_key(),
+    ).filter(key__startswith=prefix).order_by('key').values_list(
+        'id', 'name')[:limit])
+
+
+def complete(model, user_id, prefix, limit):
+    """Return up to limit (id, name) pairs of user_id starting with prefix
+
+    model is Tag or Ingredient.
+    """
+    prefix = prefix.lower()
+    if not index_cache.maxsize:
+        return query(model, user_id, prefix, limit)
+
+    resource = model._meta.model_name
+    # read before the names, so a concurrent write expires what is loaded
+    version = cache.get_version(user_id, resource)
+    index = index_cache.get((resource, user_id), version)
+    if index is None:
+        # cached under version, so read where its write is already visible
+        with routers.primary():
+            index = NameIndex(model.objects.filter(
+                user_id=user_id).values_list('id', 'name').iterator())
+        index_cache.set((resource, user_id), version, index)
+    return index.match(prefix, limit)
@@ -0,0 +1,107 @@
+"""Per-user read-through cache for recipe API responses
+
+Every cached response is stored under a key that embeds a version token
+for its (user, resource) pair. Writing to a resource replaces the token,
+so stale entries are never read again and simply expire. The token and
+the time of the last write form the change marker used for ETags. The cache
+backend is any alias from settings.CACHES, named by RECIPE_CACHE_ALIAS.
+"""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+
+from core import routers
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _marker_key(user_id, resource):
+    return f'recipe:{resource}:{user_id}:marker'
+
+
+def _last_updated(user_id, resource):
+    """Return when a user's resource last changed, from updated_at"""
+    model = apps.get_model('core', resource)
+    # a replica may not have the write the new marker stands for
+    with routers.primary():
+        updated_at = model.objects.filter(user_id=user_id).aggregate(
+            updated_at=Max('updated_at'))['updated_at']
+    return int((updated_at or timezone.now()).timestamp())
+
+
+def get_marker(user_id, resource):
+    """Return the (version, last modified) change marker of a resource
+
+    The version is a random token replaced on every write and the last
+    modified time is a POSIX timestamp. A marker missing from the cache is
+    recreated with a new token, dated by the newest updated_at row.
+    """
+    cache = get_cache()
+    key = _marker_key(user_id, resource)
+    marker = cache.get(key)
+    if marker is None:
+        # add() keeps the marker of a concurrent request that won the race
+        cache.add(key, (uuid.uuid4().hex, _last_updated(user_id, resource)),
+                  None)
+        marker = cache.get(key)
+    return marker
+
+
+def get_version(user_id, resource):
+    """Return the current version token of a user's resource"""
+    return get_marker(user_id, resource)[0]
+
+
+def invalidate(user_id, resource):
+    """Expire every cached response of a user's resource"""
+    get_cache().set(
+        _marker_key(user_id, resource),
+        (uuid.uuid4().hex, int(timezone.now().timestamp())),
+        None,
+    )
+
+
+def response_key(user_id, resources, url):
+    """Return the cache key of the response for url
+
+    The key embeds the current version of each resource the response
+    depends on, so a write to any of them expires it.
+    """
+    versions = ':'.join(get_version(user_id, resource)
+                        for resource in resources)
+    digest = hashlib.md5(url.encode('utf-8')).hexdigest()
+    return f'recipe:{user_id}:{":".join(resources)}:{versions}:{digest}'
+
+
+def fetch(key, resource):
+    """Return the cached data under key or None, counting hits/misses"""
+    data = get_cache().get(key)
+    with _stats_lock:
+        _stats[resource, 'hit' if data is not None else 'miss'] += 1
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+
+
+def get_stats():
+    """Return hit and miss counts per resource for this process"""
+    with _stats_lock:
+        stats = {}
+        for (resource, outcome), count in _stats.items():
+            stats.setdefault(resource, {'hit': 0, 'miss': 0})
+            stats[resource][outcome] = count
+        return stats
@@ -0,0 +1,131 @@
+from django import forms
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+# form fields of the values the Recipe columns can hold; they refuse
+# Infinity, NaN and numbers the database would fail to compare
+PRICE = forms.DecimalField(max_digits=5, decimal_places=2)
+TIME_MINUTES = forms.IntegerField(min_value=-2147483648, max_value=2147483647)
+
+# query parameter -> (range lookup on a Recipe field, form field)
+RANGE_PARAMS = {
+    'price_min': ('price__gte', PRICE),
+    'price_max': ('price__lte', PRICE),
+    'time_minutes_min': ('time_minutes__gte', TIME_MINUTES),
+    'time_minutes_max': ('time_minutes__lte', TIME_MINUTES),
+}
+
+# ?ordering= value -> order_by, ending with the id for keyset pagination.
+# Each is served by a (user_id, <field>, id) index.
+ORDERINGS = {
+    '-id': ('-id',),
+    'id': ('id',),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'time_minutes': ('time_minutes', 'id'),
+    '-time_minutes': ('-time_minutes', '-id'),
+}
+
+
+def params_to_ints(params, name):
+    """Return the comma separated ids of query parameter name as ints"""
+    value = params.get(name)
+    if not value:
+        return []
+    try:
+        return [int(pk) for pk in value.split(',')]
+    except ValueError:
+        raise ValidationError(
+            {name: [_('Expected a comma separated list of ids.')]})
+
+
+def params_to_bool(params, name):
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def params_to_limit(params, name, default, maximum):
+    """Return query parameter name as an int from 1 to maximum"""
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise ValidationError({name: [
+            _('Expected a number from 1 to %(maximum)d.')
+            % {'maximum': maximum}]})
+    return limit
+
+
+def _through(field):
+    """Return the through model and its recipe and related id columns"""
+    field = Recipe._meta.get_field(field)
+    return (field.remote_field.through,
+            field.m2m_column_name(), field.m2m_reverse_name())
+
+
+def recipe_has_related(field, pks, match_all=False):
+    """Return conditions for recipes related through field to pks
+
+    Each condition is an EXISTS on the through table, which probes its
+    (recipe_id, <related>_id) unique index, so no join or DISTINCT over
+    the recipes is needed. With match_all there is one EXISTS per id.
+    """
+    through, recipe_id, related_id = _through(field)
+    if match_all:
+        return [Exists(through.objects.filter(
+            **{recipe_id: OuterRef('pk'), related_id: pk})) for pk in pks]
+    return [Exists(through.objects.filter(
+        **{recipe_id: OuterRef('pk'), f'{related_id}__in': pks}))]
+
+
+def assigned_to_recipe(field):
+    """Return the condition for tags/ingredients used by any recipe"""
+    through, recipe_id, related_id = _through(field)
+    return Exists(through.objects.filter(**{related_id: OuterRef('pk')}))
+
+
+def params_to_ranges(params):
+    """Return the lookups of the RANGE_PARAMS given in params"""
+    lookups = {}
+    for name, (lookup, field) in RANGE_PARAMS.items():
+        value = params.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            lookups[lookup] = field.clean(value)
+        except DjangoValidationError as exc:
+            raise ValidationError({name: exc.messages})
+    return lookups
+
+
+def filter_recipes(queryset, params):
+    """Filter recipes by ?tags= and ?ingredients= id lists and ranges
+
+    Both lists must match when given. Within a list a recipe matches
+    with any of the ids, or with all of them when ?match=all. The
+    RANGE_PARAMS bound the price and time, inclusively.
+    """
+    match_all = params.get('match') == 'all'
+    for field in ('tags', 'ingredients'):
+        pks = params_to_ints(params, field)
+        if pks:
+            queryset = queryset.filter(
+                *recipe_has_related(field, pks, match_all))
+    return queryset.filter(**params_to_ranges(params))
+
+
+def order_recipes(queryset, params):
+    """Order recipes by ?ordering=, one of ORDERINGS (default -id)"""
+    ordering = params.get('ordering') or '-id'
+    if ordering not in ORDERINGS:
+        raise ValidationError({'ordering': [
+            _('Expected one of: %(orderings)s.')
+            % {'orderings': ', '.join(ORDERINGS)}]})
+    return queryset.order_by(*ORDERINGS[ordering])
@@ -0,0 +1,151 @@
+"""Background thumbnailing of uploaded recipe images
+
+Uploads are streamed to disk by the upload_image action, up to
+RECIPE_IMAGE_MAX_SIZE bytes, and saved with img_status pending. Once the
+transaction commits, the image is handed to a process pool that decodes
+it and writes the thumbnails with recipe.thumbnails, keeping the CPU
+bound Pillow work off the request path and out of the GIL of the serving
+process. The status becomes ready or
+failed when the worker finishes.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, \
+    TemporaryFileUploadHandler
+from django.db import close_old_connections, transaction
+
+from core.models import Recipe
+from recipe import thumbnails
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawned workers do not inherit the server's threads, sockets
+            # or database connections
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """TemporaryFileUploadHandler refusing files larger than max_size
+
+    The limit is checked as the chunks arrive, so the rest of a larger
+    file is skipped without being written to disk, and too_large is set
+    for the view to report it.
+    """
+
+    def __init__(self, request, max_size):
+        super().__init__(request)
+        self.max_size = max_size
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.too_large = True
+            # the parser closes, and so deletes, the temporary file
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def thumbnail_urls(recipe):
+    """Return the thumbnail URLs of a recipe by size and format"""
+    if recipe.img_status != Recipe.IMG_READY:
+        return {}
+    return {
+        str(size): {
+            ext: default_storage.url(
+                thumbnails.thumbnail_path(recipe.img.name, size, ext))
+            for ext, image_format in thumbnails.FORMATS
+        }
+        for size in settings.RECIPE_THUMBNAIL_SIZES
+    }
+
+
+def delete_image(name):
+    """Delete an image file and its thumbnails from storage"""
+    names = [name] + [
+        thumbnails.thumbnail_path(name, size, ext)
+        for size in settings.RECIPE_THUMBNAIL_SIZES
+        for ext, image_format in thumbnails.FORMATS
+    ]
+    for name in names:
+        default_storage.delete(name)
+
+
+def set_status(recipe_pk, name, status):
+    """Record the outcome of processing image name of a recipe
+
+    Nothing changes when the recipe is gone or has a newer image.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_pk, img=name).first()
+    if recipe is not None:
+        recipe.img_status = status
+        recipe.save(update_fields=['img_status', 'updated_at'])
+
+
+def _finished(recipe_pk, name, future):
+    # runs on a thread of the pool, which needs its own connection
+    try:
+        future.result()
+    except Exception:
+        logger.exception('Thumbnailing %s failed', name)
+        status = Recipe.IMG_FAILED
+    else:
+        status = Recipe.IMG_READY
+    try:
+        set_status(recipe_pk, name, status)
+    finally:
+        close_old_connections()
+
+
+def process(recipe):
+    """Make the thumbnails of a recipe image
+
+    With RECIPE_IMAGE_WORKERS = 0 the work is done inline, as in tests.
+    """
+    path = default_storage.path(recipe.img.name)
+    args = (path, settings.RECIPE_THUMBNAIL_SIZES,
+            settings.RECIPE_THUMBNAIL_QUALITY)
+    if not settings.RECIPE_IMAGE_WORKERS:
+        try:
+            thumbnails.make_thumbnails(*args)
+        except Exception:
+            logger.exception('Thumbnailing %s failed', recipe.img.name)
+            status = Recipe.IMG_FAILED
+        else:
+            status = Recipe.IMG_READY
+        set_status(recipe.pk, recipe.img.name, status)
+        return
+
+    future = _get_pool().submit(thumbnails.make_thumbnails, *args)
+    future.add_done_callback(
+        lambda future: _finished(recipe.pk, recipe.img.name, future))
+
+
+def process_on_commit(recipe):
+    """Process a recipe image once the current transaction commits"""
+    transaction.on_commit(lambda: process(recipe))
+
+
+def delete_on_commit(name):
+    """Delete a replaced image once the current transaction commits"""
+    transaction.on_commit(lambda: delete_image(name))
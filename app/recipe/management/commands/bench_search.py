@@ -0,0 +1,117 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from core.utils import percentile
+from recipe import search
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'salmon', 'tofu', 'rice', 'noodle', 'curry',
+    'soup', 'salad', 'cake', 'bread', 'pie', 'stew', 'roast', 'grilled',
+    'spicy', 'sweet', 'sour', 'garlic', 'ginger', 'lemon', 'tomato',
+    'mushroom', 'cheese', 'chocolate', 'vanilla', 'honey', 'miso', 'sesame',
+    'basil', 'onion', 'potato', 'carrot', 'spinach', 'pepper', 'coconut',
+    'apple', 'banana', 'almond',
+]
+TAGS = ['vegan', 'dessert', 'breakfast', 'dinner', 'quick', 'japanese',
+        'italian', 'healthy', 'party', 'winter']
+BENCH_EMAIL = 'bench-search@example.com'
+
+
+class Command(BaseCommand):
+    """Django command to time recipe search on a large fixture"""
+    help = ('Load a fixture of recipes for one user into the configured '
+            'PostgreSQL database and report recipe search latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--target-ms', type=float, default=50.0)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the fixture for later runs instead of deleting it')
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Recipe search needs PostgreSQL')
+
+        user = get_user_model().objects.filter(email=BENCH_EMAIL).first()
+        if user is None or \
+                not Recipe.objects.filter(user=user).exists():
+            user = self.load_fixture(options['recipes'])
+
+        timings = self.run_queries(
+            user, options['queries'], options['page_size'])
+        p99 = percentile(timings, 99)
+        self.stdout.write(
+            f'{len(timings)} queries: '
+            f'p50 {statistics.median(timings):.2f} ms, '
+            f'p99 {p99:.2f} ms, max {max(timings):.2f} ms')
+        self.stdout.write(self.explain(user, options['page_size']))
+
+        if not options['keep']:
+            user.delete()
+        if p99 > options['target_ms']:
+            raise CommandError(
+                f'p99 {p99:.2f} ms is above {options["target_ms"]} ms')
+        self.stdout.write(self.style.SUCCESS('Search is within target'))
+
+    def load_fixture(self, count):
+        self.stdout.write(f'Loading {count} recipes...')
+        started = time.perf_counter()
+        get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+        user = get_user_model().objects.create_user(
+            first_name='bench', last_name='search', username='bench-search',
+            phone_number='0', email=BENCH_EMAIL, password=None)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            tags = Tag.objects.bulk_create(
+                [Tag(user=user, name=name) for name in TAGS])
+            ingredients = Ingredient.objects.bulk_create(
+                [Ingredient(user=user, name=name) for name in WORDS])
+            cursor.execute(
+                'INSERT INTO core_recipe '
+                '(title, price, link, time_minutes, user_id, img_status, '
+                ' updated_at) '
+                'SELECT w[1 + i %% 40] || \' \' || w[1 + (i / 40) %% 40] '
+                '       || \' \' || w[1 + (i / 1600) %% 40], '
+                '       (i %% 400) / 4.0, \'\', 5 + i %% 120, %s, \'\', now() '
+                'FROM generate_series(1, %s) AS i, '
+                '     (SELECT %s::text[] AS w) AS words',
+                [user.pk, count, WORDS])
+            for field, objs in (('tags', tags), ('ingredients', ingredients)):
+                column = Recipe._meta.get_field(field).m2m_reverse_name()
+                cursor.execute(
+                    f'INSERT INTO core_recipe_{field} (recipe_id, {column}) '
+                    f'SELECT id, (%s::bigint[])[1 + id %% %s] '
+                    f'FROM core_recipe WHERE user_id = %s',
+                    [[obj.pk for obj in objs], len(objs), user.pk])
+            search.update_search_vector(Recipe.objects.filter(user=user))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe')
+
+        self.stdout.write(
+            f'Loaded in {time.perf_counter() - started:.1f} s')
+        return user
+
+    def run_queries(self, user, count, page_size):
+        terms = WORDS + TAGS
+        queryset = Recipe.objects.filter(user=user).only('id', 'title')
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            list(search.search(
+                queryset, random.choice(terms))[:page_size + 1])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def explain(self, user, page_size):
+        queryset = search.search(
+            Recipe.objects.filter(user=user).only('id', 'title'), 'curry')
+        return queryset[:page_size + 1].explain(analyze=True)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe
+from recipe import summaries
+
+
+class Command(BaseCommand):
+    """Django command to recompute the stored recipe summaries"""
+    help = ('Recompute Recipe.summary for every recipe, in batches of '
+            'recipes taken in primary key order.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = Recipe.objects.count()
+        done, last_pk = 0, 0
+        while True:
+            pks = list(Recipe.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                summaries.refresh(Recipe.objects.filter(pk__in=pks))
+            done += len(pks)
+            last_pk = pks[-1]
+            self.stdout.write(f'{done}/{total} recipes')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the summaries of {done} recipes'))
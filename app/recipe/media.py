@@ -0,0 +1,134 @@
+"""Responses for uploaded recipe images
+
+Files are handed off to the front proxy when MEDIA_SENDFILE names one:
+'x-accel-redirect' for nginx, with an internal location serving
+MEDIA_ACCEL_REDIRECT_PREFIX from MEDIA_ROOT, or 'x-sendfile' for Apache
+mod_xsendfile and lighttpd. Otherwise the file is returned in a
+FileResponse, which gunicorn writes with os.sendfile. Upload names embed a
+uuid and are never reused, so responses can be cached for good.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Read-only file wrapper limited to length bytes from start
+
+    It has no fileno(), so servers stream it by reading instead of
+    calling sendfile on the whole file.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return the (start, length) of a single byte range header
+
+    Return None when the header is not a single byte range, which is then
+    ignored, and raise ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-n is the last n bytes
+        start = max(size - int(last), 0)
+        last = size - 1
+    else:
+        start = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > last:
+        raise ValueError('Unsatisfiable range')
+    return start, last - start + 1
+
+
+def get_range(request, size, etag, last_modified):
+    """Return the requested (start, length) or None for the whole file"""
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and \
+            parse_http_date_safe(if_range) != last_modified:
+        # the client's copy is outdated, send the whole file
+        return None
+    return parse_range(header, size)
+
+
+def serve(request, name):
+    """Return the response for the media file name, which must exist"""
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f'{os.path.basename(name)}-{stat.st_size}')
+    content_type = mimetypes.guess_type(name)[0] or \
+        'application/octet-stream'
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, name, path, stat.st_size,
+                                  etag, last_modified, content_type)
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # private as each file is only served to the owner of its recipe
+        patch_cache_control(response, private=True, immutable=True,
+                            max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _file_response(request, name, path, size, etag, last_modified,
+                   content_type):
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        # nginx answers ranges and conditional requests itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = \
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + name
+        return response
+    if settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    try:
+        byte_range = get_range(request, size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(FileRange(file, start, length), status=206,
+                                content_type=content_type)
+        response['Content-Length'] = length
+        response['Content-Range'] = \
+            f'bytes {start}-{start + length - 1}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,377 @@
+import hashlib
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core import metrics, routers
+from core.utils import bulk_create
+from recipe import cache
+
+
+def related_pks(model, field, objs):
+    """Return the ids related through a many-to-many field, by object id
+
+    objs is a queryset or list of ids of model, and the ids of each object
+    are in ascending order.
+    """
+    field = model._meta.get_field(field)
+    through = field.remote_field.through
+    source, target = field.m2m_column_name(), field.m2m_reverse_name()
+    pks = defaultdict(list)
+    for obj_id, pk in through.objects.filter(**{
+        f'{source}__in': objs,
+    }).order_by(target).values_list(source, target):
+        pks[obj_id].append(pk)
+    return pks
+
+
+class FlatListMixin:
+    """Serialize list pages from values() rows instead of model instances
+
+    Every field of the serializer must be a model field or a many-to-many
+    primary key field. Model fields are read with values() and only passed
+    through to_representation where that changes the value, and primary
+    key fields take their ids from one through-table query per relation,
+    so the response is that of the serializer without building instances.
+    """
+    # fields whose values() value is already their representation
+    flat_identity_fields = (serializers.CharField, serializers.IntegerField,
+                            serializers.BooleanField)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_serializer().fields
+
+        columns = self.get_flat_columns(fields)
+        # the pagination reads the position from the ordering columns
+        columns += [name.lstrip('-') for name in queryset.query.order_by
+                    if name.lstrip('-') not in columns]
+        # values() makes dicts, which prefetch_related cannot fill
+        queryset = queryset.prefetch_related(None).values('pk', *columns)
+
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        with metrics.serializing(request):
+            data = self.get_flat_data(rows, fields)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def get_flat_columns(self, fields):
+        """Return the columns of the values() rows"""
+        return [field.source for field in fields.values()
+                if not isinstance(field, serializers.ManyRelatedField)]
+
+    def get_flat_data(self, rows, fields):
+        """Return the representation of values() rows of the page"""
+        model = self.queryset.model
+        converters = []
+        for name, field in fields.items():
+            if isinstance(field, serializers.ManyRelatedField):
+                pks = related_pks(model, field.source,
+                                  [row['pk'] for row in rows]) if rows else {}
+                converters.append((name, 'pk', None, pks))
+            elif type(field) in self.flat_identity_fields:
+                converters.append((name, field.source, None, None))
+            else:
+                converters.append(
+                    (name, field.source, field.to_representation, None))
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, to_representation, pks in converters:
+                if pks is not None:
+                    item[name] = pks.get(row['pk'], [])
+                elif to_representation is None or row[source] is None:
+                    item[name] = row[source]
+                else:
+                    item[name] = to_representation(row[source])
+            data.append(item)
+        return data
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user read-through cache"""
+
+    def list(self, request, *args, **kwargs):
+        resource = self.queryset.model._meta.model_name
+        key = cache.response_key(
+            request.user.pk, self.conditional_resources,
+            request.build_absolute_uri())
+        data = cache.fetch(key, resource)
+        if data is not None:
+            return Response(data)
+
+        # stored under the current version, so it must not be built from
+        # a replica that has not received the write of that version
+        with routers.primary():
+            response = super().list(request, *args, **kwargs)
+        cache.store(key, response.data)
+        return response
+
+
+class ConditionalGetMixin:
+    """Answer list and retrieve with ETag and Last-Modified validators
+
+    The validators come from the change markers of the resources in
+    conditional_resources, so a matching If-None-Match or If-Modified-Since
+    returns 304 before the queryset is evaluated or serialized. Actions opt
+    in by passing their handler to conditional_response. Within
+    DB_REPLICA_PIN_SECONDS of a change the handler reads from the
+    primary, as the replicas may not have it yet.
+    """
+    conditional_resources = ()
+
+    def get_validators(self, request):
+        """Return the (etag, last modified) pair for the request"""
+        markers = [cache.get_marker(request.user.pk, resource)
+                   for resource in self.conditional_resources]
+        tag = hashlib.sha1(repr((
+            request.user.pk,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            markers,
+        )).encode('utf-8')).hexdigest()
+        return quote_etag(tag), max(modified for _, modified in markers)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None and routers.reading_replica() and \
+                time.time() - last_modified < settings.DB_REPLICA_PIN_SECONDS:
+            # the validators would date a response of a replica that may
+            # not have the latest write yet
+            with routers.primary():
+                response = handler(request, *args, **kwargs)
+        elif response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class BulkMixin:
+    """Create and partially update objects from a list payload
+
+    POSTing a list to the list route creates every valid item with one
+    bulk insert, and PATCHing a list of items with an id to the bulk route
+    updates them with one bulk update. Many-to-many fields named in
+    bulk_relations are checked for every item with a single query per
+    related model and written as bulk inserts into the through tables.
+    Invalid items are reported by index without aborting the batch.
+    """
+    bulk_relations = ()
+    # fields whose values, regardless of case, no two items of a bulk
+    # update may share; the serializer only checks the stored rows
+    bulk_unique_fields = ()
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        items, errors = self.validate_bulk(request.data)
+        objs = [
+            self.queryset.model(user=request.user, **fields)
+            for fields, relations in items
+        ]
+        with transaction.atomic():
+            objs = self.bulk_insert(objs)
+            self.set_bulk_relations(
+                objs, [relations for fields, relations in items])
+        self.bulk_written(objs)
+
+        return self.bulk_response('created', objs, errors)
+
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update(self, request, *args, **kwargs):
+        """Partially update every object of a list payload"""
+        if not isinstance(request.data, list):
+            raise ValidationError(_('Expected a list of items.'))
+        items, errors = self.validate_bulk(request.data, partial=True)
+
+        objs, fields = [], {'updated_at'}
+        now = timezone.now()
+        for obj, (values, relations) in items:
+            for name, value in values.items():
+                setattr(obj, name, value)
+            obj.updated_at = now
+            objs.append(obj)
+            fields.update(values)
+        try:
+            with transaction.atomic():
+                self.queryset.model.objects.bulk_update(objs, fields)
+                self.set_bulk_relations(
+                    objs, [relations for obj, (fields, relations) in items],
+                    replace=True)
+        except IntegrityError:
+            # a unique value taken by a concurrent request since validation
+            raise ValidationError(
+                _('An item conflicts with an existing object.'))
+        self.bulk_written(objs)
+
+        return self.bulk_response('updated', objs, errors)
+
+    def bulk_insert(self, objs):
+        """Insert new objects and return them with their primary keys"""
+        return bulk_create(self.queryset.model, objs)
+
+    def validate_bulk(self, data, partial=False):
+        """Validate a list payload in one pass
+
+        Return (items, errors). Each item is (fields, relations) when
+        creating and (instance, (fields, relations)) when updating, where
+        fields is the validated data without bulk_relations and relations
+        maps each relation given for the item to its primary keys.
+        """
+        if len(data) > settings.RECIPE_BULK_MAX_ITEMS:
+            raise ValidationError(
+                _('Too many items, the limit is %(limit)d.')
+                % {'limit': settings.RECIPE_BULK_MAX_ITEMS})
+
+        instances = {}
+        if partial:
+            ids = [item.get('id') for item in data if isinstance(item, dict)]
+            ids = [pk for pk in ids if isinstance(pk, int)]
+            instances = self.get_queryset().in_bulk(ids)
+        existing = self.get_related_pks(data)
+
+        items, errors = [], []
+        seen = {name: {} for name in self.bulk_unique_fields}
+        for index, item in enumerate(data):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'errors': {
+                    'non_field_errors': [_('Expected an object.')]}})
+                continue
+            instance = instances.get(item.get('id')) if partial else None
+            if partial and instance is None:
+                errors.append({'index': index, 'errors': {
+                    'id': [_('Not found.')]}})
+                continue
+
+            item_errors, relations = {}, {}
+            # related primary keys are checked against `existing` instead
+            # of one query per key by the serializer field
+            values = dict(item)
+            for name in self.bulk_relations:
+                if name not in item:
+                    if not partial:
+                        values[name] = []
+                    continue
+                pks = item[name]
+                values[name] = []
+                if not isinstance(pks, list) or \
+                        not all(isinstance(pk, int) for pk in pks):
+                    item_errors[name] = [_('Expected a list of ids.')]
+                    continue
+                missing = [pk for pk in pks if pk not in existing[name]]
+                if missing:
+                    item_errors[name] = [
+                        _('Invalid pk "%(pk)s" - object does not exist.')
+                        % {'pk': pk} for pk in missing]
+                relations[name] = pks
+
+            serializer = self.get_serializer(
+                instance, data=values, partial=partial)
+            if not serializer.is_valid():
+                item_errors.update(serializer.errors)
+            if item_errors:
+                errors.append({'index': index, 'errors': item_errors})
+                continue
+
+            fields = {name: value
+                      for name, value in serializer.validated_data.items()
+                      if name not in self.bulk_relations}
+            if partial:
+                item_errors = self.check_bulk_unique(fields, index, seen)
+                if item_errors:
+                    errors.append({'index': index, 'errors': item_errors})
+                    continue
+                items.append((instance, (fields, relations)))
+            else:
+                items.append((fields, relations))
+        return items, errors
+
+    def check_bulk_unique(self, fields, index, seen):
+        """Return the errors of bulk_unique_fields taken by an earlier item
+
+        seen maps each field to the lower-cased values of the earlier items
+        and their indexes, and the values of this item are added to it.
+        """
+        item_errors = {}
+        for name in self.bulk_unique_fields:
+            if name not in fields:
+                continue
+            value = fields[name].lower()
+            if value in seen[name]:
+                item_errors[name] = [
+                    _('Same value as item %(index)d.')
+                    % {'index': seen[name][value]}]
+            else:
+                seen[name][value] = index
+        return item_errors
+
+    def get_related_pks(self, data):
+        """Return the set of existing primary keys per bulk relation"""
+        existing = {}
+        for name in self.bulk_relations:
+            # other values are reported per item by validate_bulk
+            pks = {pk for item in data if isinstance(item, dict)
+                   and isinstance(item.get(name), (list, tuple))
+                   for pk in item[name] if isinstance(pk, int)}
+            model = self.queryset.model._meta.get_field(name).related_model
+            existing[name] = set(model.objects.filter(
+                user=self.request.user, pk__in=pks,
+            ).values_list('pk', flat=True)) if pks else set()
+        return existing
+
+    def set_bulk_relations(self, objs, relations, replace=False):
+        """Write through-table rows for the relations of each object"""
+        for name in self.bulk_relations:
+            field = self.queryset.model._meta.get_field(name)
+            through = field.remote_field.through
+            source, target = field.m2m_column_name(), field.m2m_reverse_name()
+            changed = [(obj, rel[name]) for obj, rel in zip(objs, relations)
+                       if name in rel]
+            if replace and changed:
+                through.objects.filter(**{
+                    f'{source}__in': [obj.pk for obj, pks in changed],
+                }).delete()
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: pk})
+                for obj, pks in changed for pk in dict.fromkeys(pks)
+            ])
+
+    def bulk_written(self, objs):
+        """Do the work of model signals, which bulk writes do not send"""
+        cache.invalidate(
+            self.request.user.pk, self.queryset.model._meta.model_name)
+
+    def bulk_response(self, key, objs, errors):
+        pks = [obj.pk for obj in objs]
+        queryset = self.get_queryset().filter(pk__in=pks)
+        if self.bulk_relations:
+            queryset = queryset.prefetch_related(*self.bulk_relations)
+        objs = queryset.in_bulk(pks)
+        serializer = self.get_serializer([objs[pk] for pk in pks], many=True)
+
+        if not errors:
+            code = status.HTTP_201_CREATED if key == 'created' \
+                else status.HTTP_200_OK
+        elif pks:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({key: serializer.data, 'errors': errors}, status=code)
@@ -0,0 +1,159 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on every column of the ordering
+
+    The queryset ordering must end with a unique column (the id), so the
+    cursor holds the full sort key of the row at the page boundary and the
+    next page is a plain range lookup on the composite index instead of an
+    OFFSET, no matter how deep the client scrolls.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """Return the unevaluated queryset of the requested page
+
+        It holds one row more than the page size, to tell whether there is
+        another page. Its rows are passed to set_page once fetched.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            self.position, self.reverse = None, False
+        else:
+            self.position, self.reverse = cursor
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [(name, not desc) for name, desc in ordering]
+        queryset = queryset.order_by(
+            *[('-' if desc else '') + name for name, desc in ordering])
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.seek(ordering, self.position))
+            except (TypeError, ValueError, ValidationError):
+                # a position of another ordering or a tampered cursor
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Return the page of the rows fetched from page_queryset"""
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """Return (field name, descending) pairs of the queryset ordering"""
+        order_by = queryset.query.order_by
+        assert order_by, (
+            'KeysetPagination requires an ordered queryset ending with '
+            'a unique field, such as ("-name", "-id").'
+        )
+        return [(field.lstrip('-'), field.startswith('-'))
+                for field in order_by]
+
+    def seek(self, ordering, position):
+        """Return the filter selecting rows after position in ordering
+
+        For ordering (a, b) this is a <= x AND (a < x OR b < y), so the
+        leading column gives the database an index range to scan.
+        """
+        def lookup(name, desc, inclusive=False):
+            operator = 'lt' if desc else 'gt'
+            return f'{name}__{operator}{"e" if inclusive else ""}'
+
+        clauses = []
+        for index, (name, desc) in enumerate(ordering):
+            equal = [Q(**{prev[0]: value}) for prev, value
+                     in zip(ordering[:index], position)]
+            clauses.append(reduce(
+                and_, equal, Q(**{lookup(name, desc): position[index]})))
+        first_name, first_desc = ordering[0]
+        return (Q(**{lookup(first_name, first_desc, True): position[0]})
+                & reduce(or_, clauses))
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            # a values() row
+            return [item[name] for name, desc in self.ordering]
+        return [getattr(item, name) for name, desc in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def decode_cursor(self, request):
+        """Return (position, reverse) from the request, or None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({'p': position, 'r': int(reverse)},
+                            cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = b64encode(cursor.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
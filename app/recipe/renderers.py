@@ -0,0 +1,69 @@
+"""Renderers of the streamed recipe export
+
+Each renders a chunk of export rows at a time, as the rows come from
+the database, instead of a whole response.
+"""
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer
+
+from core.renderers import FastJSONRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def __init__(self):
+        self.json = FastJSONRenderer()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # error responses
+        if data is None:
+            return b''
+        return self.json.render(data) + b'\n'
+
+    def render_header(self, fields):
+        return b''
+
+    def render_rows(self, rows):
+        return b''.join(self.json.render(row) + b'\n' for row in rows)
+
+
+class CSVRenderer(BaseRenderer):
+    """Comma separated values with a header line
+
+    Tags and ingredients are columns of names separated by '|'.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # error responses, as a header line and a line of values
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows and isinstance(rows[0], dict) else []
+        return self._render([fields] + [
+            [row.get(name) for name in fields] for row in rows])
+
+    def render_header(self, fields):
+        self.fields = fields
+        return self._render([fields])
+
+    def render_rows(self, rows):
+        return self._render([
+            ['|'.join(related['name'] for related in row[name])
+             if isinstance(row[name], list) else row[name]
+             for name in self.fields]
+            for row in rows
+        ])
+
+    def _render(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode(self.charset)
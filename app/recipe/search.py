@@ -0,0 +1,66 @@
+"""Full-text search over recipe titles and tag/ingredient names
+
+On PostgreSQL every recipe keeps a stored tsvector of its title (weight A)
+and the names of its tags and ingredients (weight B), GIN-indexed by
+migration 0014 and refreshed by the signals in recipe.signals. Other
+backends fall back to case-insensitive substring matching.
+"""
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector
+from django.db import connection
+from django.db.models import BigIntegerField, Exists, F, OuterRef, Q, \
+    Subquery, Value
+from django.db.models.functions import Cast
+
+from core.models import Tag, Ingredient
+
+# ts_rank returns a float4; ranks are scaled to integers so the keyset
+# pagination cursor compares them exactly
+RANK_SCALE = 1000000
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def _names(model):
+    """Return a subquery of the space separated names of a recipe"""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (SearchVector('title', config=config, weight='A')
+            + SearchVector(_names(Tag), config=config, weight='B')
+            + SearchVector(_names(Ingredient), config=config, weight='B'))
+
+
+def update_search_vector(recipes):
+    """Recompute the stored search vector of a recipe queryset"""
+    if is_supported():
+        recipes.update(search_vector=search_vector())
+
+
+def search(queryset, terms):
+    """Return recipes of queryset matching terms, best matches first"""
+    if not is_supported():
+        return queryset.filter(
+            Q(title__icontains=terms)
+            | Exists(Tag.objects.filter(
+                recipe=OuterRef('pk'), name__icontains=terms))
+            | Exists(Ingredient.objects.filter(
+                recipe=OuterRef('pk'), name__icontains=terms))
+        ).annotate(rank=Value(0)).order_by('-rank', '-id')
+
+    query = SearchQuery(terms, config=settings.RECIPE_SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(rank=Cast(
+        SearchRank(F('search_vector'), query) * Value(RANK_SCALE),
+        BigIntegerField(),
+    )).order_by('-rank', '-id')
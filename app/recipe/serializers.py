@@ -1,9 +1,33 @@
+from django.conf import settings
+from django.core.validators import FileExtensionValidator
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from core.models import Tag, Ingredient, Recipe
+from recipe import images
 
 
-class TagSerializer(serializers.ModelSerializer):
+class BaseRecipeAttrSerializer(TimedSerializerMixin,
+                               serializers.ModelSerializer):
+    """Base serializer for tags and ingredients"""
+
+    def validate_name(self, value):
+        """Refuse renaming to a name the user has, in any case"""
+        if self.instance is None:
+            # creating an existing name returns the existing object
+            return value
+        queryset = self.Meta.model.objects.annotate(
+            lower_name=Lower('name'),
+        ).filter(user=self.instance.user_id, lower_name=value.lower())
+        if queryset.exclude(pk=self.instance.pk).exists():
+            raise serializers.ValidationError(
+                _('An object with this name already exists.'))
+        return value
+
+
+class TagSerializer(BaseRecipeAttrSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -12,7 +36,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(BaseRecipeAttrSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -21,7 +45,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipe objects"""
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -38,8 +62,8 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'ingredients', 'tags', 'time_minutes')
         read_only_fields = ('id',)
         
-class RecipeDetailSerializer(RecipeSerializer):
-    """Serializer for detail recipe objects"""
+class RecipeSummarySerializer(RecipeSerializer):
+    """Serializer for the stored summary of recipe objects"""
     ingredients = IngredientSerializer(
         many=True,
         read_only=True
@@ -48,4 +72,35 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(
         many=True,
         read_only=True
-    )
\ No newline at end of file
+    )
+
+
+class RecipeDetailSerializer(RecipeSummarySerializer):
+    """Serializer for detail recipe objects"""
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'img', 'img_status', 'thumbnails')
+        read_only_fields = ('id', 'img', 'img_status')
+
+    def get_thumbnails(self, obj):
+        return images.thumbnail_urls(obj)
+
+
+class RecipeImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
+    """Serializer for uploading images to recipes"""
+    # a FileField, as the image is only decoded by the thumbnailing
+    # workers and not on the request path like ImageField would
+    img = serializers.FileField(validators=[FileExtensionValidator(
+        settings.RECIPE_IMAGE_EXTENSIONS)])
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'img', 'img_status', 'thumbnails')
+        read_only_fields = ('id', 'img_status')
+
+    def get_thumbnails(self, obj):
+        return images.thumbnail_urls(obj)
@@ -0,0 +1,99 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import cache, images, search, summaries
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_attr_cache(sender, instance, **kwargs):
+    """Expire cached lists of the owner of a changed tag or ingredient"""
+    cache.invalidate(instance.user_id, sender._meta.model_name)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_cache(sender, instance, **kwargs):
+    """Expire cached responses of the owner of a changed recipe"""
+    cache.invalidate(instance.user_id, 'recipe')
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    """Delete the image and thumbnails of a deleted recipe"""
+    if instance.img:
+        images.delete_on_commit(instance.img.name)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    """Refresh the search vector of a saved recipe"""
+    if update_fields is None or 'title' in update_fields:
+        search.update_search_vector(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def summarize_recipe(sender, instance, update_fields=None, **kwargs):
+    """Refresh the stored summary of a saved recipe"""
+    if update_fields is None or \
+            set(update_fields) & set(summaries.SUMMARY_FIELDS):
+        summaries.refresh(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_attr_recipes(sender, instance, **kwargs):
+    # the recipes cannot be looked up once the through rows are deleted
+    instance._indexed_recipe_pks = list(
+        instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_attr_recipes(sender, instance, created=False, **kwargs):
+    """Refresh recipes using a renamed or deleted tag/ingredient
+
+    Their search vectors and summaries hold its name.
+    """
+    if created:
+        return
+    if hasattr(instance, '_indexed_recipe_pks'):
+        recipes = Recipe.objects.filter(pk__in=instance._indexed_recipe_pks)
+    else:
+        recipes = instance.recipe_set.all()
+    search.update_search_vector(recipes)
+    summaries.refresh(recipes)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump updated_at of recipes whose relations changed
+
+    Their search vectors and summaries are refreshed as well.
+    """
+    if reverse and action == 'pre_clear':
+        remember_attr_recipes(sender, instance)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        recipes = Recipe.objects.filter(pk__in=instance._indexed_recipe_pks)
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+
+    fields = {'updated_at': timezone.now()}
+    if search.is_supported():
+        fields['search_vector'] = search.search_vector()
+    recipes.update(**fields)
+    summaries.refresh(recipes)
+    cache.invalidate(instance.user_id, 'recipe')
@@ -0,0 +1,58 @@
+"""Stored list representations of recipes
+
+Recipe.summary holds the recipe as RecipeSummarySerializer renders it:
+the list fields with the id and name of each tag and ingredient. The
+signals in recipe.signals and the bulk endpoints refresh it whenever a
+recipe, its relations or the name of one of its tags or ingredients
+change, so a list page is read from the recipe table alone. The
+rebuild_recipe_summaries command recomputes every summary.
+"""
+from django.db.models import Prefetch
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.serializers import RecipeSerializer, RecipeSummarySerializer
+
+# recipe fields stored in the summary
+SUMMARY_FIELDS = ('id', 'title', 'price', 'link', 'time_minutes')
+# relations stored with names, of which the list shows the ids
+RELATIONS = ('tags', 'ingredients')
+
+
+def get_summaries(recipes):
+    """Return the summary of each recipe of a queryset by id"""
+    recipes = recipes.only(*SUMMARY_FIELDS).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only(
+            'id', 'name').order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.only(
+            'id', 'name').order_by('id')),
+    )
+    return {recipe.pk: RecipeSummarySerializer(recipe).data
+            for recipe in recipes}
+
+
+def refresh(recipes, batch_size=None):
+    """Recompute and store the summaries of a queryset of recipes"""
+    summaries = get_summaries(recipes)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, summary=summary)
+         for pk, summary in summaries.items()],
+        ['summary'], batch_size=batch_size)
+    return summaries
+
+
+def to_representation(summary):
+    """Return the RecipeSerializer representation of a summary
+
+    The keys are put back in serializer order, which a jsonb column
+    does not keep.
+    """
+    return {
+        name: [related['id'] for related in summary[name]]
+        if name in RELATIONS else summary[name]
+        for name in RecipeSerializer.Meta.fields
+    }
+
+
+def to_export(summary):
+    """Return a summary with its keys in serializer order"""
+    return {name: summary[name] for name in RecipeSerializer.Meta.fields}
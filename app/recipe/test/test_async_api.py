@@ -0,0 +1,146 @@
+import json
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from user.authentication import token_cache
+
+ASYNC_RECIPE_URL = reverse('recipe-async:recipe-list')
+ASYNC_TAG_URL = reverse('recipe-async:tag-list')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def async_detail_url(recipe_id):
+    return reverse('recipe-async:recipe-detail', args=[recipe_id])
+
+
+def sample_user(email='test@example.com', username='test'):
+    return get_user_model().objects.create_user(
+        first_name='test',
+        last_name='test',
+        username=username,
+        phone_number='123456',
+        email=email,
+        password='test1234'
+    )
+
+
+# the queries run on other threads, which only see committed rows
+class AsyncRecipeApiTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+        self.sync_client = APIClient()
+        self.sync_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dessert = Tag.objects.create(user=self.user, name='Dessert')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Vegan cake', time_minutes=30, price=5)
+        self.recipe.tags.add(self.vegan, self.dessert)
+        self.recipe.ingredients.add(self.salt)
+        Recipe.objects.create(
+            user=self.user, title='Steak', time_minutes=10, price=9)
+        cache.clear()
+        token_cache.clear()
+
+    async def test_list_recipes(self):
+        """Test that the async list returns the sync list's page"""
+        res = await self.get(ASYNC_RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = await self.run_sync(self.sync_client.get, RECIPE_URL)
+        self.assertEqual(json.loads(res.content), expected.json())
+
+    async def test_list_recipes_paginated(self):
+        """Test that the async list follows keyset cursors"""
+        res = await self.get(ASYNC_RECIPE_URL, {'page_size': 1})
+        data = json.loads(res.content)
+        self.assertEqual(len(data['results']), 1)
+
+        res = await self.get(data['next'])
+
+        data = json.loads(res.content)
+        self.assertEqual(data['results'][0]['id'], self.recipe.id)
+        self.assertEqual(data['results'][0]['tags'],
+                         [self.vegan.id, self.dessert.id])
+        self.assertIsNone(data['next'])
+
+    async def test_list_recipes_filtered(self):
+        """Test filtering the async list by tags"""
+        res = await self.get(
+            ASYNC_RECIPE_URL, {'tags': self.dessert.id})
+
+        data = json.loads(res.content)
+        self.assertEqual([r['id'] for r in data['results']],
+                         [self.recipe.id])
+
+    async def test_retrieve_recipe(self):
+        """Test that the async detail nests tags and ingredients"""
+        res = await self.get(async_detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = json.loads(res.content)
+        self.assertEqual(data['title'], 'Vegan cake')
+        self.assertEqual(data['tags'], [
+            {'id': self.vegan.id, 'name': 'Vegan'},
+            {'id': self.dessert.id, 'name': 'Dessert'},
+        ])
+        self.assertEqual(data['ingredients'],
+                         [{'id': self.salt.id, 'name': 'Salt'}])
+
+    async def test_retrieve_recipe_of_other_user(self):
+        """Test that recipes of other users are not found"""
+        other = await self.run_sync(self.create_other_recipe)
+
+        res = await self.get(async_detail_url(other.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_list_tags_assigned_only(self):
+        """Test the async tag list with assigned_only"""
+        await self.run_sync(
+            Tag.objects.create, user=self.user, name='Unused')
+
+        res = await self.get(ASYNC_TAG_URL, {'assigned_only': 1})
+
+        data = json.loads(res.content)
+        self.assertEqual([t['name'] for t in data['results']],
+                         ['Vegan', 'Dessert'])
+
+    async def test_authentication_required(self):
+        """Test that a missing or invalid token is rejected"""
+        res = await self.client.get(ASYNC_RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        res = await self.get(ASYNC_RECIPE_URL, key='invalid')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def get(self, url, data=None, key=None):
+        """GET url with the token of the user, or key"""
+        if data:
+            url = f'{url}?{urlencode(data)}'
+        # AsyncClient takes extra headers by their HTTP name
+        return await self.client.get(
+            url, authorization=f'Token {key or self.token.key}')
+
+    def create_other_recipe(self):
+        return Recipe.objects.create(
+            user=sample_user('other@example.com', 'other'),
+            title='Other', time_minutes=1, price=1)
+
+    async def run_sync(self, func, *args, **kwargs):
+        return await sync_to_async(func)(*args, **kwargs)
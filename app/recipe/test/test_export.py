@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPE_EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def sample_user(email='test@example.com', username='test'):
+    return get_user_model().objects.create_user(
+        first_name='test',
+        last_name='test',
+        username=username,
+        phone_number='123456',
+        email=email,
+        password='test1234'
+    )
+
+
+class RecipeExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self):
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dessert = Tag.objects.create(user=self.user, name='Dessert')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        cake = Recipe.objects.create(
+            user=self.user, title='Cake, "vegan"', time_minutes=30,
+            price=5)
+        cake.tags.add(vegan, dessert)
+        cake.ingredients.add(salt)
+        soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=2.5,
+            link='https://example.com/soup')
+        Recipe.objects.create(
+            user=sample_user('other@example.com', 'other'),
+            title='Other', time_minutes=1, price=1)
+        return cake, soup, vegan
+
+    def export(self, params=None, **extra):
+        res = self.client.get(RECIPE_EXPORT_URL, params, **extra)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, b''.join(res.streaming_content).decode('utf-8')
+
+    def test_export_ndjson(self):
+        """Test that the user's recipes are streamed as NDJSON"""
+        cake, soup, vegan = self.create_recipes()
+
+        res, body = self.export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [cake.id, soup.id])
+        self.assertEqual(list(rows[0]), [
+            'id', 'title', 'price', 'link', 'ingredients', 'tags',
+            'time_minutes'])
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual([tag['name'] for tag in rows[0]['tags']],
+                         ['Vegan', 'Dessert'])
+
+    def test_export_csv(self):
+        """Test that ?format=csv streams a CSV file with a header"""
+        cake, soup, vegan = self.create_recipes()
+
+        res, body = self.export({'format': 'csv'})
+
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['title'], 'Cake, "vegan"')
+        self.assertEqual(rows[0]['tags'], 'Vegan|Dessert')
+        self.assertEqual(rows[0]['ingredients'], 'Salt')
+        self.assertEqual(rows[1]['link'], 'https://example.com/soup')
+
+    def test_export_filtered_by_tags(self):
+        """Test that the export takes the filters of the list"""
+        cake, soup, vegan = self.create_recipes()
+
+        res, body = self.export({'tags': vegan.id})
+
+        self.assertEqual([json.loads(line)['id']
+                          for line in body.splitlines()], [cake.id])
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=100)
+    def test_export_memory_does_not_grow_with_rows(self):
+        """Test that peak memory is the same for 10 times more rows"""
+        def peak(count):
+            Recipe.objects.filter(user=self.user).delete()
+            Recipe.objects.bulk_create([
+                Recipe(user=self.user, title=f'Recipe {index}',
+                       time_minutes=index, price=1, summary={
+                           'id': index, 'title': f'Recipe {index}',
+                           'price': '1.00', 'link': '', 'time_minutes': 1,
+                           'tags': [{'id': 1, 'name': 'Vegan'}],
+                           'ingredients': [{'id': 1, 'name': 'Salt'}]})
+                for index in range(count)
+            ])
+            tracemalloc.start()
+            try:
+                res = self.client.get(RECIPE_EXPORT_URL)
+                lines = sum(chunk.count(b'\n')
+                            for chunk in res.streaming_content)
+                return tracemalloc.get_traced_memory()[1], lines
+            finally:
+                tracemalloc.stop()
+
+        small, small_lines = peak(500)
+        large, large_lines = peak(5000)
+
+        self.assertEqual((small_lines, large_lines), (500, 5000))
+        self.assertLess(large, small * 1.5)
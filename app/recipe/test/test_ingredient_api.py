@@ -1,3 +1,6 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -5,11 +8,13 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
+from recipe import autocomplete
 from recipe.serializers import IngredientSerializer
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 class PublicIngredientApiTests(TestCase):
@@ -40,6 +45,8 @@ class PrivateIngredientApiTests(TestCase):
             password='test1234'
         )
         self.client.force_authenticate(self.user)
+        cache.clear()
+        autocomplete.index_cache.clear()
 
     def test_private_login_required(self):
         Ingredient.objects.create(user=self.user, name="tomate")
@@ -50,7 +57,7 @@ class PrivateIngredientApiTests(TestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_gredient_limited_user(self):
         user2 = get_user_model().objects.create_user(
@@ -65,8 +72,8 @@ class PrivateIngredientApiTests(TestCase):
         ingredient = Ingredient.objects.create(user=self.user, name="apple")
         res = self.client.get(INGREDIENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredient(self):
         payload = {
@@ -89,3 +96,108 @@ class PrivateIngredientApiTests(TestCase):
         }
         res = self.client.post(INGREDIENT_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_warm_ingredient_list_skips_database(self):
+        """Test that a repeated list is served from the cache"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        first = self.client.get(INGREDIENT_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(INGREDIENT_URL)
+        self.assertEqual(res.data, first.data)
+
+    def test_create_ingredient_invalidates_list(self):
+        """Test that creating a ingredient expires the cached list"""
+        self.client.get(INGREDIENT_URL)
+        self.client.post(INGREDIENT_URL, {'name': 'Pepper'})
+
+        res = self.client.get(INGREDIENT_URL)
+        self.assertEqual(
+            [item['name'] for item in res.data['results']], ['Pepper'])
+
+    def test_ingredients_assigned_only(self):
+        """Test listing only ingredients used by a recipe"""
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        Ingredient.objects.create(user=self.user, name='sugar')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Steak', time_minutes=10, price=9)
+        self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+
+        recipe.ingredients.add(salt)
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            [item['name'] for item in res.data['results']], ['salt'])
+
+    def create_names(self, *names):
+        return [Ingredient.objects.create(user=self.user, name=name)
+                for name in names]
+
+    def test_autocomplete_prefix(self):
+        """Test names starting with a prefix, in name order"""
+        self.create_names('salt', 'Sage', 'sugar', 'Saffron', 'pepper')
+        other = get_user_model().objects.create_user(
+            first_name='test2',
+            last_name='test2',
+            username='test2',
+            phone_number='123456',
+            email='test2@example.com',
+            password='test1234'
+        )
+        Ingredient.objects.create(user=other, name='Sake')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'SA', 'limit': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in res.data],
+                         ['Saffron', 'Sage'])
+
+    def test_autocomplete_sees_new_names(self):
+        """Test that a created name is matched by the next request"""
+        self.create_names('salt')
+        self.client.get(AUTOCOMPLETE_URL, {'q': 's'})
+
+        self.client.post(INGREDIENT_URL, {'name': 'Sage'})
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 's'})
+
+        self.assertEqual([item['name'] for item in res.data],
+                         ['Sage', 'salt'])
+
+    def test_autocomplete_from_database(self):
+        """Test that the database gives the matches of the cache"""
+        salt, sage, pepper = self.create_names('salt', 'Sage', 'pepper_')
+        cached = self.client.get(AUTOCOMPLETE_URL, {'q': 's'}).data
+
+        with mock.patch.object(autocomplete.index_cache, 'maxsize', 0):
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 's'})
+            self.assertEqual(res.data, cached)
+            self.assertEqual(res.data, [{'id': sage.id, 'name': 'Sage'},
+                                        {'id': salt.id, 'name': 'salt'}])
+            # LIKE wildcards in the prefix are matched literally
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 'p%'})
+            self.assertEqual(res.data, [])
+
+    def test_autocomplete_cache_bounded_by_names(self):
+        """Test that the cached indexes hold at most maxsize names"""
+        index_cache = autocomplete.NameIndexCache(3)
+        index = autocomplete.NameIndex([(1, 'salt'), (2, 'sage')])
+
+        index_cache.set('a', 1, index)
+        index_cache.set('b', 1, autocomplete.NameIndex([(3, 'pepper')]))
+        index_cache.get('a', 1)
+        index_cache.set('c', 1, autocomplete.NameIndex([(4, 'basil')]))
+        index_cache.set('d', 1, autocomplete.NameIndex(
+            [(5, 'dill'), (6, 'mint'), (7, 'thyme'), (8, 'bay')]))
+
+        self.assertIs(index_cache.get('a', 1), index)
+        self.assertIsNone(index_cache.get('b', 1))
+        self.assertIsNone(index_cache.get('d', 1))
+        self.assertEqual(index_cache.size, 3)
+
+    def test_autocomplete_invalid_params(self):
+        """Test that a prefix is required and the limit bounded"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' '})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 's', 'limit': 1000})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
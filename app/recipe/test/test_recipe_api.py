@@ -1,15 +1,30 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from PIL import Image
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.db.models import Prefetch
 from django.urls import reverse
 
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.test.utils import QueryCountMixin
+from recipe.thumbnails import thumbnail_path
 
 RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk-update')
+RECIPE_SEARCH_URL = reverse('recipe:recipe-search')
 
 
 def detail_url(recipe_id):
@@ -24,7 +39,7 @@ def sample_ingredient(user, name='Cinnamon'):
     """Create and return a sample ingredient"""
     return Ingredient.objects.create(user=user, name=name)
     
-class PrivateRecipeApiTest(TestCase):
+class PrivateRecipeApiTest(QueryCountMixin, TestCase):
 
     def setUp(self):
         self.client = APIClient()
@@ -37,6 +52,7 @@ class PrivateRecipeApiTest(TestCase):
             password='test1234'
         )
         self.client.force_authenticate(self.user)
+        cache.clear()
 
     
 
@@ -56,7 +72,7 @@ class PrivateRecipeApiTest(TestCase):
 
         recipes = Recipe.objects.all().order_by('-id')
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retirieving recipes for user"""
@@ -75,8 +91,204 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
         res = self.client.get(RECIPE_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['title'], recipes.title)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['title'], recipes.title)
+
+    def test_recipes_paginated_by_cursor(self):
+        """Test that recipes are paged newest first with a next cursor"""
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {index}',
+                time_minutes=5, price=5.00)
+            for index in range(3)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[2].id, recipes[1].id])
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[0].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_recipes_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without queries"""
+        Recipe.objects.create(
+            user=self.user, title='Chocolate cake',
+            time_minutes=30, price=5.01)
+        res = self.client.get(RECIPE_URL)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_recipe_change_updates_etag(self):
+        """Test that changing a recipe's tags changes the ETag"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Chocolate cake',
+            time_minutes=30, price=5.01)
+        updated_at = recipe.updated_at
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        recipe.tags.add(sample_tag(user=self.user))
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
+
+    def test_recipe_patch_updates_last_modified(self):
+        """Test that a PATCH advances updated_at past the marker cache"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Chocolate cake',
+            time_minutes=30, price=5.01)
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        for model in (Recipe, Tag, Ingredient):
+            model.objects.update(
+                updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        cache.clear()
+        last_modified = self.client.get(detail_url(recipe.id))['Last-Modified']
+
+        self.client.patch(detail_url(recipe.id), {'title': 'Carrot cake'})
+        recipe.refresh_from_db()
+        self.assertGreater(
+            recipe.updated_at, datetime(2020, 1, 1, tzinfo=timezone.utc))
+
+        # a marker rebuilt from updated_at dates the change
+        cache.clear()
+        res = self.client.get(
+            detail_url(recipe.id), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Carrot cake')
+
+    def test_filter_recipes_by_tags(self):
+        """Test returning recipes with any or all of the given tags"""
+        vegan = sample_tag(user=self.user, name='Vegan')
+        dessert = sample_tag(user=self.user, name='Dessert')
+        recipe1 = Recipe.objects.create(
+            user=self.user, title='Vegan curry', time_minutes=20, price=5)
+        recipe1.tags.add(vegan)
+        recipe2 = Recipe.objects.create(
+            user=self.user, title='Vegan cake', time_minutes=40, price=7)
+        recipe2.tags.add(vegan, dessert)
+        Recipe.objects.create(
+            user=self.user, title='Steak', time_minutes=10, price=9)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{vegan.id},{dessert.id}'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe2.id, recipe1.id])
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': f'{vegan.id},{dessert.id}', 'match': 'all'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [recipe2.id])
+
+    def test_filter_recipes_by_tags_and_ingredients(self):
+        """Test that tag and ingredient filters must both match"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipe1 = Recipe.objects.create(
+            user=self.user, title='Cinnamon roll', time_minutes=20, price=5)
+        recipe1.tags.add(tag)
+        recipe1.ingredients.add(ingredient)
+        recipe2 = Recipe.objects.create(
+            user=self.user, title='Roast', time_minutes=60, price=9)
+        recipe2.tags.add(tag)
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': tag.id, 'ingredients': ingredient.id})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [recipe1.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test that non numeric filter ids are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': '1,vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes_by_price_and_time(self):
+        """Test filtering recipes by price and time ranges"""
+        quick = Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=10, price=8)
+        Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=90, price=9)
+        Recipe.objects.create(
+            user=self.user, title='Sushi', time_minutes=20, price='10.50')
+
+        res = self.client.get(
+            RECIPE_URL, {'time_minutes_max': 30, 'price_max': '10'})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [quick.id])
+
+    def test_filter_recipes_invalid_range(self):
+        """Test that bounds the columns cannot hold are rejected"""
+        for name, value in (('price_min', 'cheap'),
+                            ('price_max', '99999999999999999999'),
+                            ('price_max', 'Infinity'),
+                            ('price_min', 'NaN'),
+                            ('time_minutes_max', '1e400'),
+                            ('time_minutes_min', '99999999999999999999')):
+            with self.subTest(name=name, value=value):
+                res = self.client.get(RECIPE_URL, {name: value})
+
+                self.assertEqual(res.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+                self.assertIn(name, res.data)
+
+    def test_order_recipes_by_price_paginated(self):
+        """Test paging through recipes ordered by price with cursors"""
+        for title, price in (('A', 3), ('B', '1.50'), ('C', 3), ('D', 2)):
+            Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=price)
+
+        titles, url = [], RECIPE_URL + '?ordering=-price&page_size=3'
+        while url:
+            res = self.client.get(url)
+            titles.extend(recipe['title'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(titles, ['C', 'A', 'D', 'B'])
+
+    def test_order_recipes_not_allowed(self):
+        """Test that orderings outside the allow-list are rejected"""
+        res = self.client.get(RECIPE_URL, {'ordering': 'title'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', res.data)
+
+    def test_search_recipes(self):
+        """Test searching recipe titles and tag names"""
+        cake = Recipe.objects.create(
+            user=self.user, title='Chocolate cake', time_minutes=30, price=5)
+        curry = Recipe.objects.create(
+            user=self.user, title='Green curry', time_minutes=40, price=7)
+        curry.tags.add(sample_tag(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPE_SEARCH_URL, {'q': 'cake'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [cake.id])
+
+        res = self.client.get(RECIPE_SEARCH_URL, {'q': 'vegan'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [curry.id])
+
+    def test_search_recipes_requires_query(self):
+        """Test that searching without terms is rejected"""
+        res = self.client.get(RECIPE_SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -92,6 +304,54 @@ class PrivateRecipeApiTest(TestCase):
 
         serializer = RecipeDetailSerializer(recipe)
         self.assertEqual(res.data['id'], serializer.data['id'])
+        self.assertEqual(res.data, serializer.data)
+
+    def test_list_recipes_query_count_constant(self):
+        """Test that listing recipes does not query per recipe"""
+        def create_recipe(index):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {index}',
+                time_minutes=5, price=5.00)
+            recipe.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+            recipe.ingredients.add(
+                sample_ingredient(self.user, name=f'Ingredient {index}'))
+
+        self.assertQueryCountConstant(RECIPE_URL, create_recipe)
+
+    def test_list_recipes_output_unchanged(self):
+        """Test that the flat list renders the bytes of the serializer"""
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Crème brûlée {index}',
+                time_minutes=index, price=5.5, link='')
+            recipe.tags.add(sample_tag(self.user, name=f'Tag {index}'),
+                            sample_tag(self.user, name=f'Vegan {index}'))
+        Recipe.objects.create(
+            user=self.user, title='Plain', time_minutes=1, price=1)
+
+        res = self.client.get(RECIPE_URL)
+
+        recipes = Recipe.objects.order_by('-id').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')))
+        expected = JSONRenderer().render({
+            'next': None,
+            'previous': None,
+            'results': RecipeSerializer(recipes, many=True).data,
+        })
+        self.assertEqual(res.content, expected)
+
+    def test_view_recipe_detail_query_count_constant(self):
+        """Test that a recipe detail does not query per tag or ingredient"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Steak and mushroo sauce',
+            time_minutes=5, price=5.01)
+
+        def add_relations(index):
+            recipe.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+            recipe.ingredients.add(
+                sample_ingredient(self.user, name=f'Ingredient {index}'))
+
+        self.assertQueryCountConstant(detail_url(recipe.id), add_relations)
 
     def test_create_recipe(self):
          """Test Creating recipe"""
@@ -164,7 +424,77 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(payload['title'], recipe.title)
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 1)
-        self.assertEqual(tags, tag1)
+        self.assertIn(tag1, tags)
+
+    def test_bulk_create_recipes(self):
+        """Test creating recipes from a list with per-item errors"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        other_tag = sample_tag(user=get_user_model().objects.create_user(
+            first_name='test2', last_name='test2', username='test2',
+            phone_number='123456', email='test2@example.com',
+            password='test2222'))
+        payload = [
+            {'title': 'Chocolate cake', 'time_minutes': 30, 'price': '5.00',
+             'tags': [tag.id], 'ingredients': [ingredient.id]},
+            {'title': 'Tomate Soupe', 'time_minutes': 10, 'price': '3.00'},
+            {'title': 'Steak', 'time_minutes': 20, 'price': '9.00',
+             'tags': [other_tag.id]},
+            {'time_minutes': 5, 'price': '1.00'},
+        ]
+
+        res = self.client.post(RECIPE_URL,
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data['created']],
+            ['Chocolate cake', 'Tomate Soupe'])
+        self.assertEqual(
+            [error['index'] for error in res.data['errors']], [2, 3])
+        self.assertIn('tags', res.data['errors'][0]['errors'])
+        self.assertIn('title', res.data['errors'][1]['errors'])
+        cake = Recipe.objects.get(user=self.user, title='Chocolate cake')
+        self.assertEqual(list(cake.tags.all()), [tag])
+        self.assertEqual(list(cake.ingredients.all()), [ingredient])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_scalar_relation_rejected(self):
+        """Test that a relation given as a single id is an item error"""
+        payload = [{'title': 'Cake', 'time_minutes': 30, 'price': '5.00',
+                    'tags': 5}]
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data['errors'][0]['errors'])
+
+    def test_bulk_partial_update_recipes(self):
+        """Test partially updating recipes from a list"""
+        recipe1 = Recipe.objects.create(
+            user=self.user, title='Chocolate cake',
+            time_minutes=30, price=5.01)
+        recipe2 = Recipe.objects.create(
+            user=self.user, title='Tomate Soupe',
+            time_minutes=4, price=4.01)
+        recipe2.tags.add(sample_tag(user=self.user))
+        tag = sample_tag(user=self.user, name='dessert')
+        payload = [
+            {'id': recipe1.id, 'time_minutes': 45},
+            {'id': recipe2.id, 'title': 'Onion Soupe', 'tags': [tag.id]},
+            {'id': 0, 'title': 'Missing'},
+        ]
+
+        res = self.client.patch(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data['errors'][0]['index'], 2)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.time_minutes, 45)
+        self.assertEqual(recipe1.title, 'Chocolate cake')
+        self.assertEqual(recipe2.title, 'Onion Soupe')
+        self.assertEqual(list(recipe2.tags.all()), [tag])
 
     def test_update_recipe(self):
         recipe = Recipe.objects.create(
@@ -189,7 +519,7 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(recipe.title, payload['title'])
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 1)
-        self.assertEqual(tags, tag1)
+        self.assertIn(tag1, tags)
 
 class PublicRecipeApiTests(TestCase):
     """Test unauthentivated recipe API access"""
@@ -202,3 +532,186 @@ class PublicRecipeApiTests(TestCase):
         res = self.client.get(RECIPE_URL)
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
        
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def sample_image(size=(1200, 800), image_format='JPEG'):
+    """Return an open temporary file holding an image"""
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', size, (200, 30, 30)).save(image_file, image_format)
+    image_file.seek(0)
+    return image_file
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class RecipeImageUploadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            first_name='test',
+            last_name='test',
+            username='test',
+            phone_number='123456',
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Steak and mushroo sauce',
+            time_minutes=5, price=5.01)
+        cache.clear()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, image_file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                image_upload_url(self.recipe.id), {'img': image_file},
+                format='multipart')
+
+    def test_upload_image_to_recipe(self):
+        """Test that the upload is accepted pending and then thumbnailed"""
+        with sample_image() as image_file:
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['img_status'], Recipe.IMG_PENDING)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.img_status, Recipe.IMG_READY)
+        self.assertTrue(self.recipe.img.name.startswith('uploads/recipe/'))
+        self.assertTrue(os.path.exists(self.recipe.img.path))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        thumbnails = res.data['thumbnails']
+        self.assertEqual(len(thumbnails), len(settings.RECIPE_THUMBNAIL_SIZES))
+        for size in settings.RECIPE_THUMBNAIL_SIZES:
+            for ext in ('webp', 'jpg'):
+                path = thumbnail_path(self.recipe.img.path, size, ext)
+                with Image.open(path) as thumbnail:
+                    self.assertLessEqual(max(thumbnail.size), size)
+
+    def test_upload_image_bad_request(self):
+        """Test that a file with a bad extension is rejected"""
+        res = self.upload('notimage')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_too_large(self):
+        """Test that a file over the size limit is refused unsaved"""
+        with sample_image() as image_file, \
+                override_settings(RECIPE_IMAGE_MAX_SIZE=1000):
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('img', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.img)
+
+    def test_upload_undecodable_image_fails(self):
+        """Test that a file Pillow cannot decode is marked as failed"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'not an image')
+            image_file.seek(0)
+            with self.assertLogs('recipe.images', 'ERROR'):
+                res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.img_status, Recipe.IMG_FAILED)
+
+    def test_replaced_image_is_deleted(self):
+        """Test that uploading again deletes the previous image files"""
+        with sample_image() as image_file:
+            self.upload(image_file)
+        self.recipe.refresh_from_db()
+        replaced = self.recipe.img.path
+
+        with sample_image() as image_file:
+            self.upload(image_file)
+
+        self.assertFalse(os.path.exists(replaced))
+        self.assertFalse(os.path.exists(thumbnail_path(replaced, 160, 'jpg')))
+
+    def test_serve_image_to_owner(self):
+        """Test that the owner gets the image with long cache headers"""
+        with sample_image() as image_file:
+            res = self.upload(image_file)
+
+        res = self.client.get(res.data['img'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
+        self.recipe.refresh_from_db()
+        with open(self.recipe.img.path, 'rb') as image_file:
+            self.assertEqual(b''.join(res.streaming_content),
+                             image_file.read())
+
+        res = self.client.get(
+            self.recipe.img.url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_serve_image_range(self):
+        """Test that a byte range of an image is served"""
+        with sample_image() as image_file:
+            self.upload(image_file)
+        self.recipe.refresh_from_db()
+        size = self.recipe.img.size
+
+        res = self.client.get(self.recipe.img.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{size}')
+        with open(self.recipe.img.path, 'rb') as image_file:
+            self.assertEqual(b''.join(res.streaming_content),
+                             image_file.read()[10:20])
+
+        res = self.client.get(
+            self.recipe.img.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_serve_image_limited_to_owner(self):
+        """Test that images of other users' recipes are not served"""
+        with sample_image() as image_file:
+            self.upload(image_file)
+        self.recipe.refresh_from_db()
+        user2 = get_user_model().objects.create_user(
+            first_name='test2',
+            last_name='test2',
+            username='test2',
+            phone_number='1234562',
+            email='test2@example.com',
+            password='test12345'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(self.recipe.img.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_serve_image_with_accel_redirect(self):
+        """Test that the file is handed off to nginx when configured"""
+        with sample_image() as image_file:
+            self.upload(image_file)
+        self.recipe.refresh_from_db()
+        name = thumbnail_path(self.recipe.img.name, 160, 'webp')
+
+        res = self.client.get(f'{settings.MEDIA_URL}{name}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{name}')
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertEqual(res.content, b'')
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+
+from core.models import Recipe
+from recipe.filters import filter_recipes, order_recipes
+from recipe.pagination import KeysetPagination
+
+
+def sample_user(email, username):
+    return get_user_model().objects.create_user(
+        first_name='test',
+        last_name='test',
+        username=username,
+        phone_number='123456',
+        email=email,
+        password='test1234'
+    )
+
+
+class RecipeIndexTests(TestCase):
+    """Test that range filters and orderings of the list use an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [sample_user(f'test{index}@example.com', f'test{index}')
+                 for index in range(4)]
+        cls.user = users[0]
+        Recipe.objects.bulk_create(
+            Recipe(user=users[index % len(users)], title=f'Recipe {index}',
+                   time_minutes=index % 180, price=(index % 5000) / 100)
+            for index in range(20000))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def list_queryset(self, query):
+        """Return the page query of the recipe list for query params"""
+        params = QueryDict(query)
+        queryset = order_recipes(filter_recipes(
+            Recipe.objects.filter(user=self.user), params), params)
+        return queryset.values('pk', 'summary', 'price', 'id')[
+            :KeysetPagination.page_size + 1]
+
+    def assertIndexScan(self, queryset, index):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertRegex(plan, rf'Index (Only )?Scan.* using {index}')
+            self.assertNotIn('Sort', plan)
+        else:
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX {index}\b')
+            # no sort of the matching rows before the limit
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_price_range_ordered_by_price(self):
+        """Test a price range ordered by price"""
+        self.assertIndexScan(
+            self.list_queryset('price_min=5&price_max=10&ordering=price'),
+            'core_recipe_user_price_idx')
+
+    def test_time_range_ordered_by_time(self):
+        """Test a time range ordered by descending time"""
+        self.assertIndexScan(
+            self.list_queryset('time_minutes_max=30&ordering=-time_minutes'),
+            'core_recipe_user_time_idx')
+
+    def test_next_page_ordered_by_price(self):
+        """Test that the cursor of the next page seeks on the index"""
+        queryset = Recipe.objects.filter(user=self.user).filter(
+            KeysetPagination().seek(
+                [('price', False), ('id', False)], ['12.50', 1000]),
+        )
+        queryset = order_recipes(queryset, QueryDict('ordering=price'))
+
+        self.assertIndexScan(
+            queryset.values('pk', 'summary', 'price', 'id')[:101],
+            'core_recipe_user_price_idx')
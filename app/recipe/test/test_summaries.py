@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeSummaryTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            first_name='test',
+            last_name='test',
+            username='test',
+            phone_number='123456',
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        cache.clear()
+
+    def create_recipe(self, **params):
+        defaults = {'title': 'Vegan cake', 'time_minutes': 30,
+                    'price': '5.00', 'tags': [self.vegan.id],
+                    'ingredients': [self.salt.id]}
+        defaults.update(params)
+        res = self.client.post(RECIPE_URL, defaults, format='json')
+        return Recipe.objects.get(pk=res.data['id'])
+
+    def test_summary_kept_on_create_and_update(self):
+        """Test that the summary follows the recipe and its relations"""
+        recipe = self.create_recipe()
+        self.assertEqual(recipe.summary['title'], 'Vegan cake')
+        self.assertEqual(recipe.summary['price'], '5.00')
+        self.assertEqual(recipe.summary['tags'],
+                         [{'id': self.vegan.id, 'name': 'Vegan'}])
+
+        dessert = Tag.objects.create(user=self.user, name='Dessert')
+        self.client.patch(detail_url(recipe.id),
+                          {'title': 'Cake', 'tags': [dessert.id]},
+                          format='json')
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.summary['title'], 'Cake')
+        self.assertEqual(recipe.summary['tags'],
+                         [{'id': dessert.id, 'name': 'Dessert'}])
+
+    def test_summary_follows_tag_rename_and_delete(self):
+        """Test that renaming or deleting a tag refreshes the summary"""
+        recipe = self.create_recipe()
+
+        self.vegan.name = 'Plant based'
+        self.vegan.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.summary['tags'][0]['name'], 'Plant based')
+
+        self.salt.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.summary['ingredients'], [])
+
+    def test_list_served_from_summaries(self):
+        """Test that a list page is a single query on the recipes"""
+        self.create_recipe()
+        self.create_recipe(title='Soup')
+        # change markers are read once and then cached
+        self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'page_size': 10})
+
+        recipes = Recipe.objects.order_by('-id')
+        self.assertEqual(res.data['results'],
+                         RecipeSerializer(recipes, many=True).data)
+
+    def test_list_fills_missing_summaries(self):
+        """Test that recipes without a summary are summarized when listed"""
+        recipe = self.create_recipe()
+        Recipe.objects.update(summary=None)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'], [self.vegan.id])
+        recipe.refresh_from_db()
+        self.assertIsNotNone(recipe.summary)
+
+    def test_rebuild_recipe_summaries(self):
+        """Test that the command rebuilds every summary in batches"""
+        for index in range(5):
+            self.create_recipe(title=f'Recipe {index}')
+        Recipe.objects.update(summary=None)
+        out = StringIO()
+
+        call_command('rebuild_recipe_summaries', batch_size=2, stdout=out)
+
+        self.assertFalse(Recipe.objects.filter(summary__isnull=True).exists())
+        self.assertIn('2/5 recipes', out.getvalue())
+        self.assertIn('5/5 recipes', out.getvalue())
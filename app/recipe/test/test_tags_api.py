@@ -1,3 +1,7 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -5,11 +9,12 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
 from recipe.serializers import TagSerializer
 
 TAG_URL = reverse('recipe:tag-list')
+TAG_BULK_URL = reverse('recipe:tag-bulk-update')
 
 
 class PubllicTagApiTests(TestCase):
@@ -38,6 +43,7 @@ class PrivateTagApiTests(TestCase):
             email='test@example.com',
             password='test1234')
         self.client.force_authenticate(self.user)
+        cache.clear()
 
     def test_private_login_reuired(self):
         Tag.objects.create(user=self.user, name="Vergan")
@@ -48,7 +54,7 @@ class PrivateTagApiTests(TestCase):
 
         res = self.client.get(TAG_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_user(self):
         """Test that tag returned is for the authenticated user"""
@@ -66,8 +72,8 @@ class PrivateTagApiTests(TestCase):
         tag = Tag.objects.create(user=self.user, name='Fruity')
         res = self.client.get(TAG_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -86,3 +92,175 @@ class PrivateTagApiTests(TestCase):
         res = self.client.post(TAG_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_paginated_by_cursor(self):
+        """Test that every tag is listed once when paging with cursors"""
+        for name in ('Vegan', 'Dessert', 'Drinks', 'Meat', 'Asian'):
+            Tag.objects.create(user=self.user, name=name)
+        expected = Tag.objects.filter(user=self.user).order_by('-name', '-id')
+
+        names, url = [], TAG_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            names.extend(tag['name'] for tag in res.data['results'])
+            last_page, url = res, res.data['next']
+
+        self.assertEqual(names, [tag.name for tag in expected])
+        res = self.client.get(last_page.data['previous'])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']], names[-3:-1])
+
+    def test_tags_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        res = self.client.get(TAG_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_warm_tag_list_skips_database(self):
+        """Test that a repeated list is served from the cache"""
+        Tag.objects.create(user=self.user, name='Salt')
+        first = self.client.get(TAG_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAG_URL)
+        self.assertEqual(res.data, first.data)
+
+    def test_create_tag_invalidates_list(self):
+        """Test that creating a tag expires the cached list"""
+        self.client.get(TAG_URL)
+        self.client.post(TAG_URL, {'name': 'Pepper'})
+
+        res = self.client.get(TAG_URL)
+        self.assertEqual(
+            [item['name'] for item in res.data['results']], ['Pepper'])
+
+    def test_tags_not_modified_until_created(self):
+        """Test that the tag list ETag holds until a tag is created"""
+        res = self.client.get(TAG_URL)
+        etag = res['ETag']
+
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(TAG_URL, {'name': 'Vegan'})
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_bulk_create_tags(self):
+        """Test creating tags from a list payload"""
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}]
+
+        res = self.client.post(TAG_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['errors'], [])
+        self.assertEqual(
+            set(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True)),
+            {'Vegan', 'Dessert'})
+
+    def test_create_existing_tag(self):
+        """Test that creating a name in another case returns the tag"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAG_URL, {'name': 'VEGAN'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'id': tag.id, 'name': 'Vegan'})
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_tag_names_unique_ignoring_case(self):
+        """Test that the database refuses a name in another case"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Tag.objects.create(user=self.user, name='vegan')
+
+    def test_bulk_create_existing_tags(self):
+        """Test that a list payload reuses existing and repeated names"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        payload = [{'name': 'vegan'}, {'name': 'Dessert'},
+                   {'name': 'dessert'}]
+
+        res = self.client.post(TAG_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ids = [item['id'] for item in res.data['created']]
+        self.assertEqual(ids[0], tag.id)
+        self.assertEqual(ids[1], ids[2])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_rename_to_existing_tag(self):
+        """Test that renaming to a name in use is an item error"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Vergan')
+
+        res = self.client.patch(
+            TAG_BULK_URL, [{'id': tag.id, 'name': 'vegan'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data['errors'][0]['errors'])
+
+    def test_bulk_rename_to_same_name(self):
+        """Test that two items renamed to one name are item errors"""
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vergan', 'Vagan', 'Vegn')]
+
+        res = self.client.patch(TAG_BULK_URL, [
+            {'id': tags[0].id, 'name': 'Vegan'},
+            {'id': tags[1].id, 'name': 'vegan'},
+            {'id': tags[2].id, 'name': 'Vegan'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([item['id'] for item in res.data['updated']],
+                         [tags[0].id])
+        self.assertEqual([error['index'] for error in res.data['errors']],
+                         [1, 2])
+        self.assertIn('name', res.data['errors'][0]['errors'])
+
+    def test_bulk_rename_conflict(self):
+        """Test that a name taken after validation returns 400"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Vergan')
+
+        with patch.object(TagSerializer, 'validate_name',
+                          side_effect=lambda value: value):
+            res = self.client.patch(
+                TAG_BULK_URL, [{'id': tag.id, 'name': 'vegan'}],
+                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Vergan')
+
+    def test_bulk_rename_tags(self):
+        """Test renaming tags with a bulk partial update"""
+        tag = Tag.objects.create(user=self.user, name='Vergan')
+        self.client.get(TAG_URL)
+
+        res = self.client.patch(
+            TAG_BULK_URL, [{'id': tag.id, 'name': 'Vegan'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Vegan')
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res.data['results'][0]['name'], 'Vegan')
+
+    def test_tags_assigned_only_listed_once(self):
+        """Test that a tag used by several recipes is listed once"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+        for title in ('Curry', 'Salad'):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=10, price=5)
+            recipe.tags.add(vegan)
+
+        res = self.client.get(TAG_URL, {'assigned_only': 'true'})
+
+        self.assertEqual(
+            [tag['id'] for tag in res.data['results']], [vegan.id])
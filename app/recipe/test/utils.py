@@ -0,0 +1,30 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """Assertions about how many queries an endpoint costs"""
+
+    def assertQueryCountConstant(self, url, create_object, sizes=(1, 10)):
+        """Test that listing url costs the same queries for every size
+
+        create_object is called until the endpoint has each number of
+        objects in sizes, so a query per object (N+1) shows up as a
+        count that grows with the page.
+        """
+        counts = []
+        created = 0
+        for size in sizes:
+            while created < size:
+                create_object(created)
+                created += 1
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            counts.append(len(queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'query count grows with the number of objects: '
+            f'{dict(zip(sizes, counts))}'
+        )
@@ -0,0 +1,42 @@
+"""Recipe image decoding and thumbnailing
+
+This module runs in the worker processes of recipe.images and must not
+import Django, so the workers start without setting it up.
+"""
+import os
+import warnings
+
+from PIL import Image, ImageOps
+
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+
+def thumbnail_path(path, size, ext):
+    """Return the path of the size thumbnail of the image at path"""
+    stem = os.path.splitext(path)[0]
+    return f'{stem}_{size}.{ext}'
+
+
+def make_thumbnails(path, sizes, quality):
+    """Write a WebP and a JPEG thumbnail of every size for an image
+
+    sizes are the bounding box edges in pixels. Return the written paths,
+    or raise an error when the file is not a decodable image.
+    """
+    written = []
+    with warnings.catch_warnings():
+        # a decompression bomb is an error, not a warning
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        with Image.open(path) as image:
+            # let the JPEG decoder scale down while decoding
+            image.draft('RGB', (max(sizes), max(sizes)))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+
+    for size in sorted(sizes, reverse=True):
+        # each size is scaled from the previous, larger one
+        image.thumbnail((size, size), Image.LANCZOS)
+        for ext, image_format in FORMATS:
+            target = thumbnail_path(path, size, ext)
+            image.save(target, image_format, quality=quality)
+            written.append(target)
+    return written
@@ -1,56 +1,339 @@
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status, viewsets, mixins
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from recipe import autocomplete, images, media, search, serializers, \
+    summaries
+from recipe.filters import (
+    assigned_to_recipe, filter_recipes, order_recipes, params_to_bool,
+    params_to_limit,
+)
+from recipe.mixins import (
+    BulkMixin, CachedListMixin, ConditionalGetMixin, FlatListMixin,
+)
+from recipe.pagination import KeysetPagination
+from recipe.renderers import CSVRenderer, NDJSONRenderer
+from recipe.thumbnails import FORMATS, thumbnail_path
+from user.authentication import CachedTokenAuthentication
 # Create your views here.
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ConditionalGetMixin,
+                            CachedListMixin,
+                            FlatListMixin,
+                            BulkMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+
+    # name of the Recipe many-to-many field pointing at this model
+    recipe_field = None
+    bulk_unique_fields = ('name',)
+
+    @property
+    def conditional_resources(self):
+        resources = (self.queryset.model._meta.model_name,)
+        if self.assigned_only:
+            # assignment changes with the recipes, not the objects
+            resources += ('recipe',)
+        return resources
+
+    @property
+    def assigned_only(self):
+        return params_to_bool(self.request.query_params, 'assigned_only')
 
     def get_queryset(self):
         """Retrun objects for the current authenticated user only"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.assigned_only:
+            queryset = queryset.filter(assigned_to_recipe(self.recipe_field))
+        return queryset.order_by('-name', '-id')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    @action(detail=False)
+    def autocomplete(self, request, *args, **kwargs):
+        """Return the names starting with ?q= for typeahead
+
+        Up to ?limit= names match regardless of case, in name order.
+        """
+        return self.conditional_response(
+            self.complete, request, *args, **kwargs)
+
+    def complete(self, request, *args, **kwargs):
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            raise ValidationError({'q': [_('This parameter is required.')]})
+        limit = params_to_limit(
+            request.query_params, 'limit',
+            settings.RECIPE_AUTOCOMPLETE_LIMIT,
+            settings.RECIPE_AUTOCOMPLETE_MAX_LIMIT)
+        matches = autocomplete.complete(
+            self.queryset.model, request.user.pk, prefix, limit)
+        return Response([{'id': pk, 'name': name} for pk, name in matches])
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if response.status_code == status.HTTP_201_CREATED and \
+                not getattr(self, 'created', True):
+            response.status_code = status.HTTP_200_OK
+        return response
 
     def perform_create(self, serializer):
-        return serializer.save(user=self.request.user)
+        """Create the object, or return the one with the same name
+
+        Names are unique per user regardless of case, so posting a name
+        again returns the existing object with 200 OK.
+        """
+        serializer.instance, self.created = \
+            self.queryset.model.objects.get_or_create_name(
+                self.request.user, serializer.validated_data['name'])
+        return serializer.instance
+
+    def bulk_insert(self, objs):
+        # existing names are reused as by perform_create
+        found, created = self.queryset.model.objects.get_or_create_names(
+            self.request.user, [obj.name for obj in objs])
+        return [found[obj.name.lower()] for obj in objs]
+
+    def bulk_written(self, objs):
+        super().bulk_written(objs)
+        # renamed tags and ingredients change the recipes' search vectors
+        # and summaries
+        recipes = Recipe.objects.filter(**{
+            f'{self.recipe_field}__in': [obj.pk for obj in objs]})
+        search.update_search_vector(recipes)
+        summaries.refresh(recipes)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage Tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage Incredient in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    recipe_field = 'ingredients'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, FlatListMixin, BulkMixin,
+                    viewsets.ModelViewSet):
     """Manage Recipe in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # the detail serializer nests tag and ingredient names
+    conditional_resources = ('recipe', 'tag', 'ingredient')
+    bulk_relations = ('tags', 'ingredients')
+
+    # Columns read by the recipe serializers; the rest stays deferred. The
+    # list and search actions only read the stored summaries.
+    list_fields = ('id', 'title', 'price', 'link', 'time_minutes')
 
     def get_queryset(self):
         """Retrun objects for the current authenticated user only"""
-        return self.queryset.filter(user=self.request.user)
-    
+        queryset = self.queryset.filter(
+            user=self.request.user).order_by('-id')
+        if self.action == 'list':
+            params = self.request.query_params
+            queryset = order_recipes(filter_recipes(queryset, params), params)
+        if self.action == 'export':
+            queryset = filter_recipes(
+                queryset, self.request.query_params).order_by('id')
+        if self.action == 'search':
+            queryset = search.search(
+                queryset, self.request.query_params.get('q', ''))
+        if self.action == 'retrieve':
+            # the detail serializer nests id and name of each relation,
+            # in id order like the list
+            return queryset.only(
+                *self.list_fields, 'img', 'img_status',
+            ).prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only(
+                    'id', 'name').order_by('id')),
+                Prefetch('ingredients', queryset=Ingredient.objects.only(
+                    'id', 'name').order_by('id')),
+            )
+        if self.action in ('update', 'partial_update'):
+            # primary keys are all RecipeSerializer needs from relations.
+            # save() writes the loaded fields only, so updated_at is loaded
+            # for auto_now to advance the Last-Modified of the recipes
+            return queryset.only(
+                *self.list_fields, 'updated_at',
+            ).prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only(
+                    'id').order_by('id')),
+                Prefetch('ingredients', queryset=Ingredient.objects.only(
+                    'id').order_by('id')),
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+    @action(detail=False)
+    def search(self, request, *args, **kwargs):
+        """Search recipe titles and tag and ingredient names for ?q="""
+        if not request.query_params.get('q', '').strip():
+            raise ValidationError({'q': [_('This parameter is required.')]})
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    @action(methods=['post'], detail=True, url_path='upload-image',
+            parser_classes=(MultiPartParser,))
+    def upload_image(self, request, pk=None):
+        """Upload an image to a recipe and queue its thumbnails
+
+        The body is streamed to a temporary file, which is moved into
+        storage without being read into memory, and a file larger than
+        RECIPE_IMAGE_MAX_SIZE is refused before it fills the disk. The
+        response is sent with img_status pending before the image is
+        decoded.
+        """
+        # before request.data is parsed, even for small images
+        handler = images.LimitedUploadHandler(
+            request, settings.RECIPE_IMAGE_MAX_SIZE)
+        request.upload_handlers = [handler]
+        recipe = self.get_object()
+        replaced = recipe.img.name
+
+        data = request.data
+        if handler.too_large:
+            raise ValidationError({'img': [
+                _('The image is larger than %(limit)d bytes.')
+                % {'limit': settings.RECIPE_IMAGE_MAX_SIZE}]})
+        serializer = self.get_serializer(recipe, data=data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recipe = serializer.save(img_status=Recipe.IMG_PENDING)
+            images.process_on_commit(recipe)
+            if replaced:
+                images.delete_on_commit(replaced)
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request, *args, **kwargs):
+        """Stream every recipe of the user as NDJSON or CSV
+
+        Rows are read in chunks of RECIPE_EXPORT_CHUNK_SIZE, each a query
+        for the ids after the previous chunk, and written as they are
+        read, so memory does not grow with the collection. Unlike a
+        server-side cursor, this holds no transaction open, which works
+        through PgBouncer and on replicas. Tag and ingredient names come
+        from the stored summaries.
+        """
+        queryset = self.get_queryset()
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            self.export_chunks(queryset, renderer),
+            content_type=renderer.media_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{renderer.format}"'
+        return response
+
+    def export_chunks(self, queryset, renderer):
+        chunk_size = settings.RECIPE_EXPORT_CHUNK_SIZE
+        yield renderer.render_header(
+            serializers.RecipeSerializer.Meta.fields)
+        rows = queryset.values_list('pk', 'summary')
+        last_pk = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            missing = [pk for pk, summary in chunk if summary is None]
+            if missing:
+                built = summaries.refresh(
+                    Recipe.objects.filter(pk__in=missing))
+                chunk = [(pk, summary or built[pk]) for pk, summary in chunk]
+            yield renderer.render_rows(
+                [summaries.to_export(summary) for pk, summary in chunk])
+
+    def get_flat_columns(self, fields):
+        # the list and search pages are read from the stored summaries
+        return ['summary']
+
+    def get_flat_data(self, rows, fields):
+        missing = [row['pk'] for row in rows if row['summary'] is None]
+        if missing:
+            # recipes saved before summaries were kept
+            built = summaries.refresh(Recipe.objects.filter(pk__in=missing))
+            for row in rows:
+                if row['summary'] is None:
+                    row['summary'] = built[row['pk']]
+        return [summaries.to_representation(row['summary']) for row in rows]
+
+    def bulk_written(self, objs):
+        super().bulk_written(objs)
+        recipes = Recipe.objects.filter(pk__in=[obj.pk for obj in objs])
+        search.update_search_vector(recipes)
+        summaries.refresh(recipes)
+
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == 'retreive':
+        if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
+        if self.action == 'upload_image':
+            return serializers.RecipeImageSerializer
         return self.serializer_class
-    
+
     def perform_create(self, serializer):
         """Create recipe class"""
         serializer.save(user=self.request.user)
 
+
+class RecipeImageView(APIView):
+    """Serve recipe images and their thumbnails to the recipe owner"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, name):
+        stem = os.path.splitext(os.path.basename(name))[0].split('_')[0]
+        recipe = Recipe.objects.filter(
+            user=request.user, img__startswith=f'uploads/recipe/{stem}.',
+        ).only('img', 'img_status').first()
+        if recipe is None or name not in self.get_names(recipe):
+            raise NotFound()
+        try:
+            return media.serve(request, name)
+        except FileNotFoundError:
+            raise NotFound()
+
+    def get_names(self, recipe):
+        """Return the media names of the image and thumbnails of a recipe"""
+        names = [recipe.img.name]
+        if recipe.img_status == Recipe.IMG_READY:
+            names += [thumbnail_path(recipe.img.name, size, ext)
+                      for size in settings.RECIPE_THUMBNAIL_SIZES
+                      for ext, image_format in FORMATS]
+        return names
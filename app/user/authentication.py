@@ -0,0 +1,94 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from core import routers
+
+
+class TokenCache:
+    """Bounded, thread-safe LRU map of token keys with a time to live"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the (user, token) cached for key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        user, token = value
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _remove(self, key):
+        (user, token), expires = self._entries.pop(key)
+        keys = self._user_keys.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user.pk]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches token to user resolution
+
+    Resolved tokens are kept per process for TOKEN_AUTH_CACHE_TTL seconds.
+    Deleting a token or saving its user (password change, is_active flip)
+    evicts the entries of this process; other processes see the change
+    once their entries expire.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            # a token just created may not have reached the replicas
+            with routers.primary():
+                cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        # every request gets its own instance to modify
+        return copy.copy(user), token
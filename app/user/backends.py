@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.exceptions import PermissionDenied
+
+
+class HashingBusy(Exception):
+    """Every password hashing worker is busy and the queue is full"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(
+                settings.PASSWORD_HASHING_WORKERS
+                + settings.PASSWORD_HASHING_QUEUE)
+    return _pool
+
+
+def run_hashing(func, *args):
+    """Run a password hashing function on the bounded hashing pool
+
+    Raise HashingBusy when every worker is busy and the queue is full, so
+    a burst of logins is rejected instead of piling up behind the workers.
+    """
+    pool = _get_pool()
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def _verify(password, encoded):
+    """Return whether password matches and whether it must be rehashed"""
+    rehash = []
+    return check_password(password, encoded, setter=rehash.append), \
+        bool(rehash)
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend that hashes passwords on a bounded thread pool
+
+    Database access stays on the request thread; only the CPU bound
+    hashing runs on the pool, which limits how many cores logins can
+    take from the other endpoints. Passwords stored with an outdated
+    hasher or cost are rehashed after a successful login.
+
+    When the pool is full the login fails with PermissionDenied, which
+    stops authenticate() like invalid credentials would, and the request
+    is marked with password_hashing_busy so an API view can answer 429.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self.authenticate_pooled(
+                request, username, password, **kwargs)
+        except HashingBusy:
+            if request is not None:
+                request.password_hashing_busy = True
+            raise PermissionDenied()
+
+    def authenticate_pooled(self, request, username, password, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown users take as long as known ones
+            run_hashing(make_password, password)
+            return None
+
+        valid, rehash = run_hashing(_verify, password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if rehash:
+            user.password = run_hashing(make_password, password)
+            user.save(update_fields=['password'])
+        return user
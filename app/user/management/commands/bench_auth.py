@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    """Django command to compare token authentication classes"""
+    help = ('Time authenticating requests with the stock and the cached '
+            'token authentication against the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        # the benchmark user and token are rolled back afterwards
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                first_name='bench', last_name='auth', username='bench-auth',
+                phone_number='0', email='bench-auth@example.com',
+                password=None)
+            token = Token.objects.create(user=user)
+            request = APIRequestFactory().get(
+                '/', HTTP_AUTHORIZATION=f'Token {token.key}')
+            token_cache.clear()
+
+            for auth in (TokenAuthentication(), CachedTokenAuthentication()):
+                self.run(auth, request, options['requests'])
+            transaction.set_rollback(True)
+
+    def run(self, auth, request, count):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                auth.authenticate(request)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{type(auth).__name__}: {count / elapsed:,.0f} req/s, '
+            f'{elapsed / count * 1e6:.1f} us/req, {len(queries)} queries')
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+ME_URL = reverse('user:me')
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded token cache"""
+
+    def setUp(self):
+        self.user = get_user_model()(pk=1)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the cache keeps at most maxsize entries"""
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', (self.user, 'a'))
+        cache.set('b', (self.user, 'b'))
+        cache.get('a')
+        cache.set('c', (self.user, 'c'))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+    def test_expired_entry_missed(self):
+        """Test that entries older than the ttl are not returned"""
+        cache = TokenCache(maxsize=2, ttl=-1)
+        cache.set('a', (self.user, 'a'))
+
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            first_name='test',
+            last_name='test',
+            username='test',
+            phone_number='123456',
+            email='test@example.com',
+            password='test1234',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test that a repeated request does not look up the token"""
+        self.client.get(ME_URL)
+
+        # the profile itself is read again
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test that a deleted (logged out) token stops working"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a user evicts their tokens"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_changed_elsewhere(self):
+        """Test that the profile is not served from the cached user"""
+        self.client.get(ME_URL)
+        # as another process would, without evicting this one's entry
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            username='renamed')
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['username'], 'renamed')
+
+    def test_password_change_evicts_user(self):
+        """Test that a password change through the API refreshes the user"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'password': 'newpassword123'})
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user = token_cache.get(self.token.key)[0]
+        self.assertTrue(user.check_password('newpassword123'))
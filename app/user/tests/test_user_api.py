@@ -1,10 +1,16 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.backends import HashingBusy
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -19,6 +25,8 @@ class PublicUserApiTest(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        # login throttling counts attempts in the cache
+        cache.clear()
 
     def test_create_valid_user_success(self):
         """Test creating user with valid payload is successful"""
@@ -151,6 +159,53 @@ class PublicUserApiTest(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_token_rehashes_outdated_password(self):
+        """Test that logging in upgrades a password hashed with PBKDF2"""
+        user = create_user(first_name='test', last_name='test',
+                           username='test', phone_number='123456',
+                           email='test@example.com', password='test1111')
+        user.password = make_password('test1111', hasher='pbkdf2_sha256')
+        user.save()
+
+        res = self.client.post(
+            TOKEN_URL, {'email': user.email, 'password': 'test1111'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2'))
+        self.assertTrue(user.check_password('test1111'))
+
+    def test_token_throttled_per_email(self):
+        """Test that repeated logins for one email are rejected early"""
+        payload = {'email': 'test@example.com', 'password': 'wrong'}
+        for _ in range(10):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_token_list_payload(self):
+        """Test that a JSON array body is a validation error"""
+        res = self.client.post(TOKEN_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('user.backends.run_hashing', side_effect=HashingBusy)
+    def test_login_while_hashing_busy(self, run_hashing):
+        """Test that a full hashing pool throttles API logins only"""
+        payload = {'email': 'test@example.com', 'password': 'test1111'}
+        create_user(first_name='test', last_name='test', username='test',
+                    phone_number='123456', **payload)
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # the admin login form is not a DRF view
+        res = self.client.post(reverse('admin:login'), {
+            'username': payload['email'], 'password': payload['password']})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_retrieve_user_auauthorized(self):
         """Test that authentication is required for users"""
         res = self.client.get(ME_URL)
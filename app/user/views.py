@@ -1,7 +1,11 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import Throttled, ValidationError
 from rest_framework.settings import api_settings
+from .authentication import CachedTokenAuthentication
 from .serializers import UserSerializer, AuthTokenSerializer
+from .throttling import LoginEmailRateThrottle, LoginIPRateThrottle
 # Create your views here.
 
 
@@ -14,14 +18,29 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # checked before the serializer hashes the password
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except ValidationError:
+            # every password hashing worker was busy, see user.backends
+            if getattr(request, 'password_hashing_busy', False):
+                raise Throttled(wait=1)
+            raise
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        """Retrieve and return authentication user"""
-        return self.request.user
+        """Retrieve and return authentication user
+
+        request.user may be the copy cached by another process before a
+        change, so the profile is read again.
+        """
+        return get_user_model().objects.get(pk=self.request.user.pk)